@@ -1,27 +1,141 @@
 import os
 import json
 import time
+import random
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import pandas as pd
+import xlsxwriter
 from dotenv import load_dotenv
 from tencentcloud.common import credential
 from tencentcloud.common.profile.client_profile import ClientProfile
 from tencentcloud.common.profile.http_profile import HttpProfile
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 from tencentcloud.cam.v20190116 import cam_client, models
-from openpyxl import load_workbook
-from openpyxl.styles import numbers
 
 # 加载环境变量
 load_dotenv()
 
+
+class RateLimiter:
+    """令牌桶限流，acquire() 在超出速率时阻塞等待
+
+    速率按 AIMD 自适应：throttled() 时减半（不低于 min_rate）并清空积攒的令牌，
+    succeeded() 时按初始速率的 1/20 逐步恢复，不超过初始速率。
+    """
+
+    def __init__(self, rate, min_rate=0.5):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+
+class ResponseCache:
+    """CAM 接口响应的 SQLite 缓存：每个 (类别, 键) 一行，保存版本、拉取时间和 JSON 响应
+
+    所有条目只在 ttl 秒内复用，作为中断后续跑的断点，超过 ttl 的条目重新拉取：
+    换绑关联实体时 AttachEntityCount 可能不变，跨多次运行复用会把已解除关联的用户继续报告为有权限。
+    带版本的条目（策略关联实体，版本为策略的 UpdateTime 与 AttachEntityCount）还要求版本一致。
+    每条响应拉取后立即写入。
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.hits = self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # 每条响应单独提交，WAL 模式下写入开销较小
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, version TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                "payload TEXT NOT NULL, PRIMARY KEY (kind, key))")
+
+    def get(self, kind, key, version=None):
+        """读取仍然有效的条目，无效或不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT version, fetched_at, payload FROM responses WHERE kind = ? AND key = ?",
+                                     (kind, str(key))).fetchone()
+            valid = row is not None and row[0] == (version or '') and time.time() - row[1] <= self.ttl
+            if valid:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[2]) if valid else None
+
+    def put(self, kind, key, payload, version=None):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                               (kind, str(key), version or '', time.time(), json.dumps(payload, ensure_ascii=False)))
+
+    def versions(self, kind):
+        """某类别下仍在有效期内的条目的 键 -> 版本"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, version FROM responses WHERE kind = ? AND fetched_at >= ?",
+                                           (kind, time.time() - self.ttl)).fetchall())
+
+
 class TencentCloudExporter:
+    # 被限频（RequestLimitExceeded）时的最大重试次数与退避上限（秒）
+    API_MAX_RETRIES = 5
+    API_BACKOFF_MAX = 10.0
+    # 分页接口每页数量
+    RP = 200
+    # 每抓取多少个策略输出一次进度
+    PROGRESS_EVERY = 100
+
     def __init__(self):
         self.cred = credential.Credential(
             os.getenv("TENCENTCLOUD_SECRET_ID"),
             os.getenv("TENCENTCLOUD_SECRET_KEY")
         )
         self.client = self._init_cam_client()
+        # 每个接口一个自适应限速器，初始速率为 CAM 接口默认频率上限（CAM_QPS，默认 20 次/秒）
+        self.api_qps = float(os.getenv("CAM_QPS", "20"))
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        # 并发抓取策略分页及各策略关联实体的线程数（CAM_MAX_WORKERS，默认 8），实际速率仍受 CAM_QPS 限制
+        self.max_workers = int(os.getenv("CAM_MAX_WORKERS", "8"))
+        # 用户组 -> 成员、用户组 -> 关联策略，每个组只查询一次
+        self._group_members = {}
+        self._group_policies = {}
+        # 接口响应的本地缓存（CAM_CACHE_PATH，置空关闭）：响应在 CAM_CACHE_TTL 秒（默认 1 天）内复用，
+        # 中断后重跑从断点继续；策略关联实体还要求策略的更新时间与关联实体数未变化
+        cache_path = os.getenv("CAM_CACHE_PATH", "target/cam-cache.sqlite")
+        self.cache = ResponseCache(cache_path, float(os.getenv("CAM_CACHE_TTL", "86400"))) if cache_path else None
 
     def _init_cam_client(self):
         """初始化CAM客户端"""
@@ -31,6 +145,74 @@ class TencentCloudExporter:
         client_profile.httpProfile = http_profile
         return cam_client.CamClient(self.cred, "", client_profile)
 
+    def _call(self, action, req):
+        """统一的 CAM 接口调用入口：按接口限速，RequestLimitExceeded 时降速并以带抖动的指数退避重试"""
+        with self._limiters_lock:
+            limiter = self._limiters.setdefault(action, RateLimiter(self.api_qps))
+        for attempt in range(self.API_MAX_RETRIES + 1):
+            limiter.acquire()
+            try:
+                resp = getattr(self.client, action)(req)
+            except TencentCloudSDKException as e:
+                if not (e.get_code() or '').startswith('RequestLimitExceeded') or attempt == self.API_MAX_RETRIES:
+                    raise
+                limiter.throttled()
+                delay = random.uniform(0, min(self.API_BACKOFF_MAX, 2 ** attempt))
+                print(f"{action} 被限频，速率降至 {limiter.rate:.1f} 次/秒，{delay:.2f}s 后重试")
+                time.sleep(delay)
+                continue
+            limiter.succeeded()
+            return resp
+
+    def api_rates(self):
+        """各接口当前的限速速率（次/秒）"""
+        with self._limiters_lock:
+            return {action: round(limiter.rate, 2) for action, limiter in self._limiters.items()}
+
+    def _cached(self, kind, key, fetch, version=None):
+        """经本地缓存获取接口数据：缓存有效时直接返回，否则调用 fetch() 并立即写入缓存"""
+        if self.cache is None:
+            return fetch()
+        data = self.cache.get(kind, key, version)
+        if data is None:
+            data = fetch()
+            self.cache.put(kind, key, data, version)
+        return data
+
+    def _list_all(self, action, params, items_key):
+        """逐页顺序拉取分页接口的全部结果"""
+        return [item for batch, _ in self._list_pages(action, params, items_key, concurrent=False) for item in batch]
+
+    def _list_pages(self, action, params, items_key, concurrent=True):
+        """按 Page/Rp 分页拉取，逐页产出 (当前页列表, 总数)
+
+        第一页读出 TotalNum 后其余页并发拉取（concurrent 为 False 或接口未返回总数时逐页顺序拉取），按页序产出。
+        """
+        request_class = getattr(models, f"{action}Request")
+
+        def fetch(page):
+            req = request_class()
+            req.from_json_string(json.dumps(dict(params, Page=page, Rp=self.RP)))
+            data = json.loads(self._call(action, req).to_json_string())
+            return data.get(items_key) or [], data.get("TotalNum")
+
+        items, total = fetch(1)
+        yield items, total
+        if len(items) < self.RP:
+            return
+
+        if total is None or not concurrent:
+            page = 1
+            while len(items) == self.RP:
+                page += 1
+                items, _ = fetch(page)
+                yield items, total
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for items, _ in executor.map(fetch, range(2, -(-total // self.RP) + 1)):
+                yield items, total
+
     # ---------------------- 用户数据获取 ----------------------
     def _process_users(self, users_data):
         """处理子用户数据结构"""
@@ -44,14 +226,17 @@ class TencentCloudExporter:
 
     def get_all_users(self):
         """获取所有子用户"""
-        try:
+        def fetch():
             req = models.ListUsersRequest()
             params = {
             }
             req.from_json_string(json.dumps(params))
-            resp = self.client.ListUsers(req)
+            resp = self._call("ListUsers", req)
             data = json.loads(resp.to_json_string())
-            users = data.get("Data", [])
+            return data.get("Data", [])
+
+        try:
+            users = self._cached("users", "", fetch)
             return self._process_users(users)
         except TencentCloudSDKException as e:
             print(f"获取所有子用户失败: {e}")
@@ -68,201 +253,246 @@ class TencentCloudExporter:
 
     def get_all_collaborators(self):
         """获取所有协作者"""
-        try:
+        def fetch():
             req = models.ListCollaboratorsRequest()
-            resp = self.client.ListCollaborators(req)
+            resp = self._call("ListCollaborators", req)
             data = json.loads(resp.to_json_string())
-            users = data.get("Data", [])
+            return data.get("Data", [])
+
+        try:
+            users = self._cached("collaborators", "", fetch)
             return self._process_collaborators(users)
         except TencentCloudSDKException as e:
             print(f"获取所有协作者失败: {e}")
             return []
 
 
-    # ---------------------- 策略数据获取 ----------------------
-    def get_all_policies(self):
-        """分页获取所有策略及关联用户"""
-        policies = []
-        page = 0
-        rp = 200  # 每页策略数量
+    # ---------------------- 用户组数据获取 ----------------------
+    def get_all_groups(self):
+        """获取所有用户组"""
+        return [group for batch, _ in self._list_pages("ListGroups", {}, "GroupInfo") for group in batch]
+
+    def _fetch_group_members(self, group_id):
+        """分页获取用户组成员"""
+        users = self._cached("group_members", group_id,
+                             lambda: self._list_all("ListUsersForGroup", {"GroupId": group_id}, "UserInfo"))
+        return [{"账号ID": str(u.get("Uin", "")), "用户名称": str(u.get("Name", ""))} for u in users]
+
+    def _fetch_group_policies(self, group_id):
+        """分页获取用户组关联的策略"""
+        return self._cached("group_policies", group_id,
+                            lambda: self._list_all("ListAttachedGroupPolicies", {"TargetGroupId": group_id}, "List"))
+
+    def _load_groups(self, groups, with_policies=False):
+        """并发拉取尚未缓存的用户组成员（with_policies 时同时拉取组关联策略），建立 组 -> 成员 索引"""
+        group_ids = [int(group["GroupId"]) for group in groups if int(group["GroupId"]) not in self._group_members]
+        for group_id, members in zip(group_ids, self._ordered_map(self._fetch_group_members, group_ids, "用户组成员抓取")):
+            self._group_members[group_id] = members
+        if with_policies:
+            group_ids = [int(group["GroupId"]) for group in groups if int(group["GroupId"]) not in self._group_policies]
+            for group_id, policies in zip(group_ids, self._ordered_map(self._fetch_group_policies, group_ids,
+                                                                       "用户组策略抓取")):
+                self._group_policies[group_id] = policies
+
+    @staticmethod
+    def _group_grant(group_name):
+        return f"随组关联（{group_name}）"
 
+    # ---------------------- 策略数据获取 ----------------------
+    @staticmethod
+    def _policy_version(policy):
+        """策略更新时间与关联实体数，作为关联实体缓存的版本（换绑实体时关联实体数可能不变，需结合有效期）"""
+        return f"{policy.get('UpdateTime', '')}|{policy.get('AttachEntityCount', '')}"
+
+    def _fetch_policy_users(self, policy):
+        """分页获取策略关联的用户：直接关联的用户（RelatedType=1）及关联用户组（RelatedType=2）的成员
+
+        关联实体按策略版本缓存（有效期 CAM_CACHE_TTL），用户组成员在展开时按 组 -> 成员 索引取得。
+        """
+        policy_id = int(policy.get("PolicyId"))
+        params = {"PolicyId": policy_id, "EntityFilter": "All"}
+        entities = self._cached("policy_entities", policy_id,
+                                lambda: self._list_all("ListEntitiesForPolicy", params, "List"),
+                                version=self._policy_version(policy))
+        users = []
+        for e in entities:
+            if e.get("RelatedType") == 1:
+                users.append({
+                    "账号ID": str(e.get("Uin", "")),
+                    "用户名称": str(e.get("Name", "")),
+                    "关联时间": str(e.get("AttachmentTime", "")),
+                    "关联方式": "直接关联"
+                })
+            elif e.get("RelatedType") == 2:
+                users.extend(dict(member, 关联时间=str(e.get("AttachmentTime", "")),
+                                  关联方式=self._group_grant(e.get("Name", "")))
+                             for member in self._group_members.get(int(e.get("Id")), []))
+        return users
+
+    def _fetch_user_policies(self, user):
+        """分页获取用户直接关联的策略"""
+        params = {"TargetUin": int(user["账号ID"]), "AttachType": 1}  # 1：只返回直接关联的策略
+        return self._cached("user_policies", user["账号ID"],
+                            lambda: self._list_all("ListAttachedUserAllPolicies", params, "PolicyList"))
+
+    @staticmethod
+    def _is_attached(policy):
+        """ListPolicies 返回的 AttachEntityCount 为 0 表示策略未关联任何实体，缺失时按已关联处理"""
+        return policy.get("AttachEntityCount") != 0
+
+    def _build_policy(self, policy, users=None):
+        """构造策略数据结构，未传入关联用户时按需查询（未关联任何实体的策略不发请求）"""
+        if users is None:
+            users = self._fetch_policy_users(policy) if self._is_attached(policy) else []
+        return {
+            "策略名称": policy.get("PolicyName", "N/A"),
+            "策略类型": "预设" if policy.get("Type") == 2 else "自定义",
+            "策略描述": policy.get("Description", ""),
+            "关联用户": users  # 存储用户ID及关联类型
+        }
+
+    def _ordered_map(self, fn, items, label):
+        """用线程池对 items 逐个执行 fn，按输入顺序流式产出结果
+
+        在途任务数不超过 CAM_MAX_WORKERS 的 4 倍，每 PROGRESS_EVERY 个输出一次进度。
+        """
+        start = time.monotonic()
+        done, total = 0, len(items)
+        pending = deque()
+
+        def progress():
+            elapsed = time.monotonic() - start
+            print(f"{label}进度：{done}/{total}，耗时 {elapsed:.1f}s，{done / max(elapsed, 1e-6):.1f} 个/秒")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                for item in items:
+                    pending.append(executor.submit(fn, item))
+                    if len(pending) < self.max_workers * 4:
+                        continue
+                    yield pending.popleft().result()
+                    done += 1
+                    if done % self.PROGRESS_EVERY == 0:
+                        progress()
+                while pending:
+                    yield pending.popleft().result()
+                    done += 1
+                    if done % self.PROGRESS_EVERY == 0:
+                        progress()
+            finally:
+                for future in pending:
+                    future.cancel()
+        if done % self.PROGRESS_EVERY:
+            progress()
+
+    def _iter_policies_by_user(self, policies, users, groups):
+        """用户→策略方向：逐个用户查询直接关联的策略，用户组的关联策略按 组 -> 成员 索引展开，再按策略汇总关联用户"""
+        policy_users = {}
+        for user, attached in zip(users, self._ordered_map(self._fetch_user_policies, users, "用户策略抓取")):
+            for item in attached:
+                policy_users.setdefault(int(item.get("PolicyId")), []).append({
+                    "账号ID": user["账号ID"],
+                    "用户名称": user["用户名称"],
+                    "关联时间": str(item.get("AddTime", "")),
+                    "关联方式": "直接关联"
+                })
+        for group in groups:
+            group_id = int(group["GroupId"])
+            for item in self._group_policies.get(group_id, []):
+                policy_users.setdefault(int(item.get("PolicyId")), []).extend(
+                    dict(member, 关联时间=str(item.get("AddTime", "")), 关联方式=self._group_grant(group.get("GroupName", "")))
+                    for member in self._group_members.get(group_id, []))
+        for policy in policies:
+            yield self._build_policy(policy, policy_users.get(int(policy.get("PolicyId")), []))
+
+    def iter_policies(self, users=None):
+        """并发抓取所有策略及关联用户，按策略列表顺序流式产出
+
+        先拉取全部策略（含 AttachEntityCount），未关联任何实体的策略跳过关联查询；
+        传入用户清单时比较两个方向的接口调用数：策略→用户 每个有关联的策略至少 1 次 ListEntitiesForPolicy，
+        用户→策略 每个用户至少 1 次 ListAttachedUserAllPolicies 且每个用户组 1 次 ListAttachedGroupPolicies，
+        选择调用更少的方向。两个方向都先拉取每个用户组的成员（各 1 次），把随组关联的策略展开到成员。
+        策略→用户 方向只需为本地缓存中没有有效条目（已过期或版本已变化）的策略发请求，中断后续跑时通常远少于用户数。
+        """
         try:
-            # 阶段1：获取所有策略基础信息
-            while True:
-                time.sleep(0.1)
-                page += 1
-                req = models.ListPoliciesRequest()
-                req.Page = page
-                req.Rp = rp
-                resp = self.client.ListPolicies(req)
-                data = json.loads(resp.to_json_string())
-                batch = data.get("List", [])
-
-                # 阶段2：遍历每个策略获取关联用户
-                for policy in batch:
-                    policy_id = int(policy.get("PolicyId"))
-                    users = []
-                    entity_page = 0
-
-                    # 分页获取关联实体
-                    while True:
-                        time.sleep(0.02)
-                        entity_page += 1
-                        req = models.ListEntitiesForPolicyRequest()
-                        params = {
-                            "PolicyId": policy_id,
-                            "Page": entity_page,
-                            "Rp": rp,
-                            "EntityFilter": "User"  # 仅获取用户类型实体
-                        }
-                        req.from_json_string(json.dumps(params))
-
-                        resp = self.client.ListEntitiesForPolicy(req)
-                        entity_data = json.loads(resp.to_json_string())
-
-                        # 过滤用户类型实体（RelatedType=1）
-                        users.extend([
-                            {
-                                "账号ID": str(e.get("Uin", "")),
-                                "用户名称": str(e.get("Name", "")),
-                                "关联时间": str(e.get("AttachmentTime", ""))
-                            }
-                            for e in entity_data.get("List", [])
-                            if e.get("RelatedType") == 1
-                        ])
-
-                        if len(entity_data.get("List", [])) < rp:
-                            break
-
-                    # 构造策略数据结构
-                    policies.append({
-                        "策略名称": policy.get("PolicyName", "N/A"),
-                        "策略类型": "预设" if policy.get("Type") == 2 else "自定义",
-                        "策略描述": policy.get("Description", ""),
-                        "关联用户": users  # 存储用户ID及关联类型
-                    })
-
-                if len(batch) < rp:
-                    break
-
+            policies = [policy for batch, _ in self._list_pages("ListPolicies", {}, "List") for policy in batch]
+            groups = self.get_all_groups()
+            attached = [policy for policy in policies if self._is_attached(policy)]
+            cached = self.cache.versions("policy_entities") if self.cache else {}
+            changed = sum(1 for policy in attached
+                          if cached.get(str(policy.get("PolicyId"))) != self._policy_version(policy))
+            by_user = users is not None and len(users) + len(groups) < changed
+            print(f"策略共 {len(policies)} 个，其中有关联实体的 {len(attached)} 个（需重新抓取 {changed} 个）；"
+                  f"用户组 {len(groups)} 个；采用{'用户→策略' if by_user else '策略→用户'}方向抓取关联关系"
+                  f"（约 {len(users) + 2 * len(groups) if by_user else changed + len(groups)} 次调用）")
+            self._load_groups(groups, with_policies=by_user)
+            if by_user:
+                yield from self._iter_policies_by_user(policies, users, groups)
+            else:
+                yield from self._ordered_map(self._build_policy, policies, "策略抓取")
         except TencentCloudSDKException as e:
             print(f"策略查询失败: {e}")
 
-        return policies
+    def get_all_policies(self):
+        """获取所有策略及关联用户"""
+        return list(self.iter_policies())
 
     # ---------------------- Excel导出逻辑 ----------------------
+    # 各 Sheet 的 (列名, 列宽)，账号ID列设为文本格式，避免长数字显示为科学计数法
+    USER_COLUMNS = [("用户名称", 20), ("用户类型", 12), ("账号ID", 18), ("备注信息", 30), ("控制台登录", 15)]
+    POLICY_COLUMNS = [("策略名称", 30), ("策略类型", 12), ("策略描述", 150)]
+    RELATION_COLUMNS = [("用户名称", 20), ("账号ID", 20), ("策略名称", 30), ("策略描述", 150), ("关联方式", 30)]
+
     def export_accounts(self):
         filename = f"{datetime.now().year}年度腾讯云账号权限清单.xlsx"
-        with pd.ExcelWriter(
-                filename,
-                engine='openpyxl',
-                mode='w'
-        ) as writer:
-            # 初始化 Sheet
-            pd.DataFrame(columns=["用户名称", "用户类型", "账号ID", "备注信息", "控制台登录"]).to_excel(
-                writer,
-                sheet_name='用户清单',
-                index=False
-            )
-            pd.DataFrame(columns=["策略名称", "策略类型", "策略描述"]).to_excel(
-                writer,
-                sheet_name='策略清单',
-                index=False
-            )
-            pd.DataFrame(columns=["用户名称", "账号ID", "策略名称", "策略描述"]).to_excel(
-                writer,
-                sheet_name='策略关联',
-                index=False
-            )
+        # constant_memory 模式下每行写完即落盘，内存占用与行数无关；同一 Sheet 内必须按行序写入
+        workbook = xlsxwriter.Workbook(filename, {"constant_memory": True})
+        try:
+            header_format = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+            text_format = workbook.add_format({"num_format": "@"})
+            ws_users = self._add_sheet(workbook, "用户清单", self.USER_COLUMNS, header_format, text_format)
+            ws_policies = self._add_sheet(workbook, "策略清单", self.POLICY_COLUMNS, header_format, text_format)
+            ws_relations = self._add_sheet(workbook, "策略关联", self.RELATION_COLUMNS, header_format, text_format)
 
             # 获取所有数据
             users = self.get_all_users()
             collaborators = self.get_all_collaborators()
             combined_users = users + collaborators  # 合并子用户和协作者数据
-            policies = self.get_all_policies()
 
             # 用户清单写入
-            if combined_users:
-                df_users = pd.DataFrame(combined_users)
-                df_users.to_excel(writer, sheet_name='用户清单', index=False)
-                self._format_sheet(writer, '用户清单', {
-                    'A': 20, 'B': 12, 'C': 18, 'D': 30, 'E': 15
-                })
+            for row, user in enumerate(combined_users, start=1):
+                ws_users.write_row(row, 0, [user.get(name) for name, _ in self.USER_COLUMNS])
 
-            # 策略清单写入（排除关联用户）
-            if policies:
-                df_policies = pd.DataFrame([
-                    {
-                        "策略名称": p["策略名称"],
-                        "策略类型": p["策略类型"],
-                        "策略描述": p["策略描述"]
-                    } for p in policies
-                ])
-                df_policies.to_excel(writer, sheet_name='策略清单', index=False)
-                self._format_sheet(writer, '策略清单', {'A': 30, 'B': 12, 'C': 150})
-
-            # 策略关联处理
-            relations = []
-            for policy in policies:
+            # 边抓取边写入策略清单与策略关联，不保留每个策略的关联用户列表
+            relation_row = 0
+            for row, policy in enumerate(self.iter_policies(combined_users), start=1):
+                ws_policies.write_row(row, 0, [policy["策略名称"], policy["策略类型"], policy["策略描述"]])
                 for user_info in policy.get("关联用户", []):
-                    relations.append({
-                        "用户名称": user_info.get("用户名称", "N/A"),
-                        "账号ID": str(user_info.get("账号ID", "")),
-                        "策略名称": policy["策略名称"],
-                        "策略描述": policy["策略描述"]
-                    })
-
-            if relations:
-                df_relations = pd.DataFrame(relations)
-
-                # 按名称排序
-                df_sorted = df_relations.sort_values(by="用户名称").reset_index(drop=True)
-                df_sorted.to_excel(writer, sheet_name='策略关联', index=False)
-                df_relations.to_excel(writer, sheet_name='策略关联', index=False)
-
-                # 应用格式设置
-                self._format_sheet(writer, '策略关联', {
-                    'A': 20, 'B': 20, 'C': 30, 'D': 150
-                })
+                    relation_row += 1
+                    ws_relations.write_row(relation_row, 0, [
+                        user_info.get("用户名称", "N/A"),
+                        str(user_info.get("账号ID", "")),
+                        policy["策略名称"],
+                        policy["策略描述"],
+                        user_info.get("关联方式", "直接关联")
+                    ])
+        finally:
+            workbook.close()
 
-        self._post_process_excel(filename)
         print(f"文件已生成：{filename}")
-
-    def _format_sheet(self, writer, sheet_name, widths=None):
-        """通用表格格式化"""
-        workbook = writer.book
-        ws = workbook[sheet_name]
-
-        # 设置列宽
-        for col, width in (widths or {}).items():
-            ws.column_dimensions[col].width = width
-
-        # 首行冻结
-        ws.freeze_panes = 'A2'
-
-        # 处理科学计数法
-        if sheet_name == '用户清单':
-            for col in ['C']:  # 账号ID列
-                for cell in ws[col]:
-                    cell.number_format = numbers.FORMAT_TEXT
-
-        if sheet_name == '策略关联':
-            for col in ['B']:  # 账号ID
-                for cell in ws[col]:
-                    cell.number_format = numbers.FORMAT_TEXT
-
-    def _post_process_excel(self, filename):
-        """最终格式优化"""
-        wb = load_workbook(filename)
-
-        # 删除空Sheet
-        for sheet in ['Sheet1', 'Sheet']:
-            if sheet in wb.sheetnames and wb[sheet].max_row == 1:
-                del wb[sheet]
-
-        # 设置默认视图
-        wb.active = wb['用户清单']
-        wb.save(filename)
+        print(f"接口速率: {self.api_rates()}")
+        if self.cache:
+            print(f"本地缓存 {self.cache.path}：命中 {self.cache.hits} 次，新抓取 {self.cache.misses} 次")
+
+    @staticmethod
+    def _add_sheet(workbook, sheet_name, columns, header_format, text_format):
+        """新建 Sheet：设置列宽与账号ID列的文本格式，写入表头并冻结首行"""
+        ws = workbook.add_worksheet(sheet_name)
+        for col, (name, width) in enumerate(columns):
+            ws.set_column(col, col, width, text_format if name == "账号ID" else None)
+        ws.write_row(0, 0, [name for name, _ in columns], header_format)
+        ws.freeze_panes(1, 0)
+        return ws
 
 
 if __name__ == "__main__":
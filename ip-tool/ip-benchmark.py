@@ -0,0 +1,432 @@
+"""
+ip-locator 性能基准：用本地生成的资源清单替代腾讯云 SDK 客户端与 K8s API，
+无需真实凭证即可测量单 IP、批量及网段查询的延迟、API 调用次数与内存峰值。
+
+示例：python ip-benchmark.py --cvm 20000 --cfs 2000 --pods 100000 --contexts 10 --latency 30
+"""
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import ipaddress
+import tracemalloc
+import importlib.util
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+from tencentcloud.clb.v20180317 import clb_client
+from tencentcloud.cvm.v20170312 import cvm_client
+from tencentcloud.cfs.v20190719 import cfs_client
+from tencentcloud.mariadb.v20170312 import mariadb_client
+from tencentcloud.redis.v20180412 import redis_client
+from tencentcloud.es.v20180416 import es_client
+from tencentcloud.ckafka.v20190819 import ckafka_client
+from tencentcloud.vpc.v20170312 import vpc_client
+from tencentcloud.cdb.v20170320 import cdb_client
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_locator_module():
+    """ip-locator.py 文件名含连字符，通过 importlib 按路径加载"""
+    spec = importlib.util.spec_from_file_location("ip_locator", os.path.join(BASE_DIR, "ip-locator.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def ip_at(network: str, index: int) -> str:
+    """网段内第 index 个主机地址，用于生成互不重叠的资源 IP"""
+    net = ipaddress.ip_network(network)
+    return str(net.network_address + 1 + index)
+
+
+# ---------------------- 模拟资源清单 ----------------------
+class Inventory:
+    """按数量参数生成各资源类型的响应数据，并预建 IP 反查表，避免模拟端成为瓶颈"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.clb = [{
+            "LoadBalancerId": f"lb-{i:08d}", "LoadBalancerName": f"clb-{i}",
+            "LoadBalancerType": "OPEN" if i % 3 == 0 else "INTERNAL",
+            "LoadBalancerVips": [ip_at("10.1.0.0/16", i)], "Status": 1, "Zones": ["ap-guangzhou-3"]
+        } for i in range(args.clb)]
+        self.cvm = [{
+            "InstanceId": f"ins-{i:08d}", "InstanceName": f"cvm-{i}", "InstanceState": "RUNNING",
+            "PrivateIpAddresses": [ip_at("10.16.0.0/12", i)], "PublicIpAddresses": [ip_at("43.128.0.0/11", i)],
+            "Placement": {"Zone": "ap-guangzhou-3"}, "CreatedTime": "2024-01-01T00:00:00Z"
+        } for i in range(args.cvm)]
+        self.cfs = [{
+            "FileSystemId": f"cfs-{i:08d}", "FsName": f"fs-{i}", "Zone": "ap-guangzhou-3",
+            "LifeCycleState": "available"
+        } for i in range(args.cfs)]
+        self.cfs_clients = {fs["FileSystemId"]: [{
+            "CfsVip": ip_at("10.2.0.0/16", i), "ClientIp": ip_at("10.16.0.0/12", (i * args.cfs_clients + j) % max(args.cvm, 1)),
+            "VpcId": "vpc-benchmark", "MountDirectory": "/mnt/cfs"
+        } for j in range(args.cfs_clients)] for i, fs in enumerate(self.cfs)}
+        self.mariadb = [{
+            "InstanceId": f"tdsql-{i:08d}", "InstanceName": f"mariadb-{i}", "Vip": ip_at("10.3.0.0/16", i),
+            "Vport": 3306, "Region": "ap-guangzhou", "Status": 2
+        } for i in range(args.mariadb)]
+        self.redis = [{
+            "InstanceId": f"crs-{i:08d}", "InstanceName": f"redis-{i}", "WanIp": ip_at("10.4.0.0/16", i),
+            "Port": 6379, "Region": "ap-guangzhou", "Status": 2
+        } for i in range(args.redis)]
+        self.ckafka = [{
+            "InstanceId": f"ckafka-{i:08d}", "InstanceName": f"ckafka-{i}", "Status": 1
+        } for i in range(args.ckafka)]
+        self.ckafka_attributes = {instance["InstanceId"]: {
+            "InstanceId": instance["InstanceId"], "InstanceName": instance["InstanceName"],
+            "Vip": ip_at("10.5.0.0/16", i), "Vport": "9092"
+        } for i, instance in enumerate(self.ckafka)}
+        self.es = [{
+            "InstanceId": f"es-{i:08d}", "InstanceName": f"es-{i}", "EsVip": ip_at("10.6.0.0/16", i), "EsPort": 9200,
+            "Zone": "ap-guangzhou-3", "Status": 1, "KibanaUrl": f"https://{ip_at('10.7.0.0/16', i)}:5601",
+            "KibanaPrivateAccess": "OPEN"
+        } for i in range(args.es)]
+        self.eip = [{
+            "AddressId": f"eip-{i:08d}", "AddressName": f"eip-{i}", "AddressIp": ip_at("43.128.0.0/11", i),
+            "PrivateAddressIp": ip_at("10.16.0.0/12", i), "InstanceId": f"ins-{i:08d}", "AddressStatus": "BIND"
+        } for i in range(args.eip)]
+        self.eni = [{
+            "NetworkInterfaceId": f"eni-{i:08d}", "NetworkInterfaceName": f"eni-{i}", "Zone": "ap-guangzhou-3",
+            "State": "AVAILABLE", "Attachment": {"InstanceId": f"ins-{i:08d}"},
+            "PrivateIpAddressSet": [{"PrivateIpAddress": ip_at("10.16.0.0/12", i), "Primary": True}]
+        } for i in range(args.eni)]
+        self.nat = [{
+            "NatGatewayId": f"nat-{i:08d}", "NatGatewayName": f"nat-{i}", "Zone": "ap-guangzhou-3",
+            "State": "AVAILABLE", "PublicIpAddressSet": [{"PublicIpAddress": ip_at("119.28.0.0/16", i)}]
+        } for i in range(args.nat)]
+        self.cdb = [{
+            "InstanceId": f"cdb-{i:08d}", "InstanceName": f"cdb-{i}", "Vip": ip_at("10.8.0.0/16", i), "Vport": 3306,
+            "Zone": "ap-guangzhou-3", "Status": 1
+        } for i in range(args.cdb)]
+
+        self.contexts = [f"cls-benchmark-{c}" for c in range(args.contexts)]
+        per_context = args.pods // max(args.contexts, 1)
+        self.pods = {ctx: [self._pod(c, i, c * per_context + i) for i in range(per_context)]
+                     for c, ctx in enumerate(self.contexts)}
+
+        self.clb_by_vip = self._by_ip(self.clb, lambda item: item["LoadBalancerVips"])
+        self.cvm_by_private_ip = self._by_ip(self.cvm, lambda item: item["PrivateIpAddresses"])
+        self.cvm_by_public_ip = self._by_ip(self.cvm, lambda item: item["PublicIpAddresses"])
+        self.eip_by_ip = self._by_ip(self.eip, lambda item: [item["AddressIp"]])
+        self.eni_by_ip = self._by_ip(self.eni, lambda item: [a["PrivateIpAddress"] for a in item["PrivateIpAddressSet"]])
+        self.cdb_by_vip = self._by_ip(self.cdb, lambda item: [item["Vip"]])
+
+    @staticmethod
+    def _pod(context_index: int, index: int, seq: int) -> Dict:
+        return {
+            "metadata": {"uid": f"uid-{context_index}-{index}", "namespace": f"ns-{index % 50}",
+                         "name": f"pod-{index}", "resourceVersion": "1"},
+            "spec": {"containers": [{"name": "app"}]},
+            "status": {"podIP": ip_at("172.16.0.0/12", seq), "hostIP": ip_at("10.16.0.0/12", seq % 1000),
+                       "phase": "Running"}
+        }
+
+    @staticmethod
+    def _by_ip(items: List[Dict], ips_of: Callable[[Dict], List[str]]) -> Dict[str, List[Dict]]:
+        index: Dict[str, List[Dict]] = {}
+        for item in items:
+            for ip in ips_of(item):
+                index.setdefault(ip, []).append(item)
+        return index
+
+    def sample_ips(self) -> List[str]:
+        """可被命中的 IP 样本（每种资源取一部分）"""
+        ips = []
+        ips += [lb["LoadBalancerVips"][0] for lb in self.clb]
+        ips += [ins["PrivateIpAddresses"][0] for ins in self.cvm] + [ins["PublicIpAddresses"][0] for ins in self.cvm]
+        ips += [clients[0]["CfsVip"] for clients in self.cfs_clients.values() if clients]
+        ips += [ins["Vip"] for ins in self.mariadb] + [ins["WanIp"] for ins in self.redis] + [ins["EsVip"] for ins in self.es]
+        ips += [attrs["Vip"] for attrs in self.ckafka_attributes.values()]
+        ips += [pod["status"]["podIP"] for pods in self.pods.values() for pod in pods]
+        return ips
+
+
+# ---------------------- 模拟 SDK 客户端 ----------------------
+class FakeBackend:
+    """模拟腾讯云 API：按 action 返回分页后的响应 JSON，并注入每次调用的延迟"""
+
+    def __init__(self, inventory: Inventory, latency: float):
+        self.inventory = inventory
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+
+    @staticmethod
+    def _page(items: List[Dict], params: Dict, default_limit: int = 20) -> List[Dict]:
+        offset = params.get("Offset") or 0
+        limit = params.get("Limit") or default_limit
+        return items[offset:offset + limit]
+
+    @staticmethod
+    def _filter_values(params: Dict, name: str) -> Optional[List[str]]:
+        for item in params.get("Filters") or []:
+            if item.get("Name") == name:
+                return item.get("Values") or []
+        return None
+
+    @staticmethod
+    def _lookup(index: Dict[str, List[Dict]], ips: List[str]) -> List[Dict]:
+        matched: Dict[int, Dict] = {}
+        for ip in ips:
+            for item in index.get(ip, ()):
+                matched[id(item)] = item
+        return list(matched.values())
+
+    def handle(self, service: str, action: str, params: Dict) -> Dict:
+        self.calls[f"{service}.{action}"] = self.calls.get(f"{service}.{action}", 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        inv = self.inventory
+        key = f"{service}.{action}"
+
+        if key == "clb.DescribeLoadBalancers":
+            items = self._lookup(inv.clb_by_vip, params["LoadBalancerVips"]) if params.get("LoadBalancerVips") else inv.clb
+            if params.get("LoadBalancerType"):
+                items = [lb for lb in items if lb["LoadBalancerType"] == params["LoadBalancerType"]]
+            return {"TotalCount": len(items), "LoadBalancerSet": self._page(items, params)}
+        if key == "cvm.DescribeInstances":
+            items = inv.cvm
+            private_ips = self._filter_values(params, "private-ip-address")
+            public_ips = self._filter_values(params, "public-ip-address")
+            if private_ips is not None:
+                items = self._lookup(inv.cvm_by_private_ip, private_ips)
+            elif public_ips is not None:
+                items = self._lookup(inv.cvm_by_public_ip, public_ips)
+            return {"TotalCount": len(items), "InstanceSet": self._page(items, params)}
+        if key == "cvm.DescribeRegions":
+            return {"TotalCount": 1, "RegionSet": [{"Region": "ap-guangzhou", "RegionState": "AVAILABLE"}]}
+        if key == "cfs.DescribeCfsFileSystems":
+            return {"TotalCount": len(inv.cfs), "FileSystems": self._page(inv.cfs, params)}
+        if key == "cfs.DescribeCfsFileSystemClients":
+            clients = inv.cfs_clients.get(params.get("FileSystemId"), [])
+            return {"TotalCount": len(clients), "ClientList": self._page(clients, params)}
+        if key == "mariadb.DescribeDBInstances":
+            return {"TotalCount": len(inv.mariadb), "Instances": self._page(inv.mariadb, params)}
+        if key == "redis.DescribeInstances":
+            return {"TotalCount": len(inv.redis), "InstanceSet": self._page(inv.redis, params)}
+        if key == "ckafka.DescribeInstances":
+            return {"Result": {"TotalCount": len(inv.ckafka), "InstanceList": self._page(inv.ckafka, params)}}
+        if key == "ckafka.DescribeInstanceAttributes":
+            return {"Result": inv.ckafka_attributes[params["InstanceId"]]}
+        if key == "es.DescribeInstances":
+            return {"TotalCount": len(inv.es), "InstanceList": self._page(inv.es, params)}
+        if key == "vpc.DescribeAddresses":
+            ips = self._filter_values(params, "address-ip")
+            items = inv.eip if ips is None else self._lookup(inv.eip_by_ip, ips)
+            return {"TotalCount": len(items), "AddressSet": self._page(items, params)}
+        if key == "vpc.DescribeNetworkInterfaces":
+            ips = self._filter_values(params, "address-ip")
+            items = inv.eni if ips is None else self._lookup(inv.eni_by_ip, ips)
+            return {"TotalCount": len(items), "NetworkInterfaceSet": self._page(items, params)}
+        if key == "vpc.DescribeNatGateways":
+            return {"TotalCount": len(inv.nat), "NatGatewaySet": self._page(inv.nat, params)}
+        if key == "cdb.DescribeDBInstances":
+            items = self._lookup(inv.cdb_by_vip, params["Vips"]) if params.get("Vips") else inv.cdb
+            return {"TotalCount": len(items), "Items": self._page(items, params)}
+        raise NotImplementedError(key)
+
+    def client_factory(self, service: str, sdk_class: type) -> Callable:
+        """生成与真实 SDK 客户端同构的模拟类：请求序列化、响应反序列化仍走 SDK 原有逻辑，只替换 HTTP 调用"""
+        backend = self
+
+        class FakeClient(sdk_class):
+            def __init__(self, credential, region, profile=None):
+                self.region = region
+
+            def call(self, action, params, options=None, headers=None):
+                response = backend.handle(service, action, params)
+                response["RequestId"] = "benchmark"
+                return json.dumps({"Response": response}).encode("utf-8")
+
+        return FakeClient
+
+
+class FakeCoreV1Api:
+    """模拟 K8s CoreV1Api：list_pod_for_all_namespaces 按 limit/continue 分页返回原始 JSON 响应体
+    （支持 status.podIP 字段选择器），watch 请求返回空的事件流"""
+
+    def __init__(self, pods: List[Dict], latency: float, calls: Dict[str, int]):
+        self._pods = pods
+        self._by_ip = {pod["status"]["podIP"]: [pod] for pod in pods}
+        self._latency = latency
+        self._calls = calls
+
+    def list_pod_for_all_namespaces(self, watch: bool = False, limit: Optional[int] = None,
+                                    _continue: Optional[str] = None, field_selector: Optional[str] = None, **kwargs):
+        self._calls["k8s.list_pod_for_all_namespaces"] = self._calls.get("k8s.list_pod_for_all_namespaces", 0) + 1
+        if self._latency:
+            time.sleep(self._latency)
+        if watch:
+            # 清单不变，增量同步收不到事件
+            return SimpleNamespace(stream=lambda amt=None, decode_content=False: iter(()),
+                                   close=lambda: None, release_conn=lambda: None)
+
+        pods = self._pods
+        if field_selector and field_selector.startswith("status.podIP="):
+            pods = self._by_ip.get(field_selector.split("=", 1)[1], [])
+        start = int(_continue or 0)
+        end = start + limit if limit else len(pods)
+        body = {"metadata": {"resourceVersion": "1", "continue": str(end) if end < len(pods) else None},
+                "items": pods[start:end]}
+        return SimpleNamespace(data=json.dumps(body).encode())
+
+
+def build_locator(module, backend: FakeBackend, inventory: Inventory, args: argparse.Namespace):
+    """创建定位器并注入模拟客户端；限速默认放开，只测量定位器本身的开销"""
+    locator = module.TencentCloudIPLocator()
+    locator.regions_setting = ""
+    locator.index_ttl = 10 ** 9
+    sdk_classes = {
+        "clb": clb_client.ClbClient, "cvm": cvm_client.CvmClient, "cfs": cfs_client.CfsClient,
+        "mariadb": mariadb_client.MariadbClient, "redis": redis_client.RedisClient,
+        "ckafka": ckafka_client.CkafkaClient, "es": es_client.EsClient,
+        "vpc": vpc_client.VpcClient, "cdb": cdb_client.CdbClient
+    }
+    for service, sdk_class in sdk_classes.items():
+        locator._client_factories[service] = backend.client_factory(service, sdk_class)
+    if not args.throttle:
+        locator.API_QPS_LIMITS = {}
+        locator.api_qps = 1e9
+        locator._limiters.clear()
+
+    apis = {ctx: FakeCoreV1Api(pods, args.k8s_latency / 1000, backend.calls) for ctx, pods in inventory.pods.items()}
+    locator._k8s_contexts = lambda: list(inventory.contexts)
+    locator.get_k8s_api = lambda ctx_name: apis[ctx_name]
+    return locator
+
+
+# ---------------------- 测量 ----------------------
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def measure(name: str, backend: FakeBackend, fn: Callable[[], List[float]], trace_memory: bool) -> Dict:
+    """执行一个场景，返回总耗时、单次延迟分位数、API 调用次数及（可选）内存峰值"""
+    calls_before = sum(backend.calls.values())
+    if trace_memory:
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    latencies = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - memory_before if trace_memory else None
+    return {
+        "scenario": name,
+        "ops": len(latencies),
+        "total_s": elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "api_calls": sum(backend.calls.values()) - calls_before,
+        "peak_mb": peak / 1024 / 1024 if peak is not None else None
+    }
+
+
+def timed_each(fn: Callable[[str], object], items: List[str]) -> List[float]:
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def timed_once(fn: Callable[[], object]) -> List[float]:
+    start = time.perf_counter()
+    fn()
+    return [time.perf_counter() - start]
+
+
+def print_report(results: List[Dict]):
+    print(f"\n{'scenario':<28}{'ops':>8}{'total_s':>10}{'p50_ms':>10}{'p99_ms':>10}{'api_calls':>11}{'peak_mb':>10}")
+    for r in results:
+        peak = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else "-"
+        print(f"{r['scenario']:<28}{r['ops']:>8}{r['total_s']:>10.3f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['api_calls']:>11}{peak:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ip-locator 性能基准（模拟 SDK 与 K8s API，无需真实凭证）")
+    parser.add_argument("--clb", type=int, default=2000)
+    parser.add_argument("--cvm", type=int, default=20000)
+    parser.add_argument("--cfs", type=int, default=2000)
+    parser.add_argument("--cfs-clients", type=int, default=4, help="每个文件系统的客户端数量")
+    parser.add_argument("--mariadb", type=int, default=500)
+    parser.add_argument("--redis", type=int, default=1000)
+    parser.add_argument("--ckafka", type=int, default=300)
+    parser.add_argument("--es", type=int, default=200)
+    parser.add_argument("--eip", type=int, default=1000)
+    parser.add_argument("--eni", type=int, default=1000)
+    parser.add_argument("--nat", type=int, default=20)
+    parser.add_argument("--cdb", type=int, default=500)
+    parser.add_argument("--pods", type=int, default=100000, help="Pod 总数，平均分布到各上下文")
+    parser.add_argument("--contexts", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0, help="每次云 API 调用注入的延迟（毫秒）")
+    parser.add_argument("--k8s-latency", type=float, default=0, help="每次 K8s API 调用注入的延迟（毫秒）")
+    parser.add_argument("--live-lookups", type=int, default=5, help="不使用索引的实时单 IP 查询次数")
+    parser.add_argument("--live-batch", type=int, default=200, help="不使用索引的批量实时查询（query_many）的 IP 数量")
+    parser.add_argument("--lookups", type=int, default=10000, help="索引单 IP 查询次数")
+    parser.add_argument("--batch", type=int, default=50000, help="批量查询的 IP 数量（含约 20%% 未命中）")
+    parser.add_argument("--cidr", default="10.16.0.0/24,10.16.0.0/16,172.16.0.0/14",
+                        help="逗号分隔的网段查询列表")
+    parser.add_argument("--throttle", action="store_true", help="保留定位器默认的接口限速")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="不统计内存峰值（tracemalloc 会拖慢执行）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "TENCENTCLOUD_SECRET_ID": os.getenv("TENCENTCLOUD_SECRET_ID") or "benchmark",
+        "TENCENTCLOUD_SECRET_KEY": os.getenv("TENCENTCLOUD_SECRET_KEY") or "benchmark",
+        "TENCENTCLOUD_REGIONS": "",
+        "K8S_WATCH": "false"
+    })
+    if not args.throttle:
+        os.environ["CKAFKA_QPS"] = "1000000000"
+    module = load_locator_module()
+    module.logger.setLevel(logging.WARNING)
+    random.seed(args.seed)
+
+    start = time.perf_counter()
+    inventory = Inventory(args)
+    backend = FakeBackend(inventory, args.latency / 1000)
+    locator = build_locator(module, backend, inventory, args)
+    sample = inventory.sample_ips()
+    print(f"模拟清单生成完成：{len(sample)} 个可命中 IP，耗时 {time.perf_counter() - start:.2f}s")
+
+    trace_memory = not args.no_tracemalloc
+    if trace_memory:
+        tracemalloc.start()
+
+    def pick(n: int, miss_ratio: float = 0.2) -> List[str]:
+        return [random.choice(sample) if random.random() >= miss_ratio else ip_at("192.168.0.0/16", random.randrange(60000))
+                for _ in range(n)]
+
+    results = [
+        measure("single (live, concurrent)", backend,
+                lambda: timed_each(locator.query_all_resources_concurrent, pick(args.live_lookups)), trace_memory),
+        measure("batch (live, planned)", backend,
+                lambda: timed_once(lambda: locator.query_many(pick(args.live_batch))), trace_memory),
+        measure("index build (cold)", backend, lambda: timed_once(lambda: locator.refresh_index(force=True)), trace_memory),
+        measure("single (index)", backend,
+                lambda: timed_each(lambda ip: locator.locate(ip, refresh=False), pick(args.lookups)), trace_memory),
+        measure("batch (index)", backend,
+                lambda: timed_once(lambda: sum(1 for _ in locator.locate_many(pick(args.batch)))), trace_memory)
+    ]
+    for cidr in [c.strip() for c in args.cidr.split(',') if c.strip()]:
+        results.append(measure(f"cidr {cidr}", backend,
+                               lambda: timed_once(lambda: locator.locate_cidr(cidr, refresh=False)), trace_memory))
+
+    print_report(results)
+    print("\nAPI 调用次数（累计）:")
+    for action, count in sorted(backend.calls.items()):
+        print(f"  {action:<40}{count:>8}")
+    print(f"\n索引规模：{len(locator._index)} 个 IP")
+
+
+if __name__ == "__main__":
+    main()
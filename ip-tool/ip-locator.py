@@ -1,8 +1,29 @@
+import gc
 import os
+import sys
+import json
+import time
+import random
+import hashlib
+import sqlite3
 import logging
-from typing import Dict, List
+import argparse
+import ipaddress
+import threading
+from array import array
+from collections import deque
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from functools import partial
+from itertools import islice
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from urllib.parse import unquote, urlparse
 from dotenv import load_dotenv
 from tencentcloud.common import credential
+from tencentcloud.common.profile.client_profile import ClientProfile
+from tencentcloud.common.profile.http_profile import HttpProfile
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 from tencentcloud.clb.v20180317 import clb_client, models as clb_models
 from tencentcloud.cvm.v20170312 import cvm_client, models as cvm_models
@@ -11,7 +32,10 @@ from tencentcloud.mariadb.v20170312 import mariadb_client, models as mariadb_mod
 from tencentcloud.redis.v20180412 import redis_client, models as redis_models
 from tencentcloud.es.v20180416 import es_client, models as es_models
 from tencentcloud.ckafka.v20190819 import ckafka_client, models as ckafka_models
-from kubernetes import client as k8s_client, config as k8s_config
+from tencentcloud.vpc.v20170312 import vpc_client, models as vpc_models
+from tencentcloud.cdb.v20170320 import cdb_client, models as cdb_models
+from kubernetes import client as k8s_client, config as k8s_config, watch as k8s_watch
+from kubernetes.client.rest import ApiException
 
 def setup_logging():
     log_dir = 'target'
@@ -38,17 +62,611 @@ def setup_logging():
 logger = setup_logging()
 
 
+def normalize_ip(value) -> Optional[str]:
+    """标准化 IP 地址（IPv4/IPv6），无效地址返回 None"""
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(str(value).strip()).compressed
+    except ValueError:
+        return None
+
+
+def match_resources(ips: Iterable[str], pairs: Iterable[Tuple[str, Dict]]) -> Dict[str, List[Dict]]:
+    """在 (IP, 资源信息) 流中查找一批 IP 绑定的资源，同一资源对同一 IP 只计一次"""
+    matched: Dict[str, Dict[int, Dict]] = {}
+    wanted: Dict[str, List[str]] = {}
+    for ip in ips:
+        matched[ip] = {}
+        key = normalize_ip(ip)
+        if key is not None:
+            wanted.setdefault(key, []).append(ip)
+    for addr, record in pairs:
+        for ip in wanted.get(normalize_ip(addr), ()):
+            matched[ip][id(record)] = record
+    return {ip: list(records.values()) for ip, records in matched.items()}
+
+
+class TTLCache:
+    """线程安全的过期缓存，记录命中与未命中次数"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: Dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > time.time():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+
+    def prune(self):
+        """清理已过期的条目（包括已删除资源留下的缓存）"""
+        with self._lock:
+            now = time.time()
+            for key in [key for key, entry in self._data.items() if entry[0] <= now]:
+                del self._data[key]
+
+
+class RateLimiter:
+    """令牌桶限流，acquire() 在超出速率时阻塞等待
+
+    速率按 AIMD 自适应：throttled() 时减半（不低于 min_rate）并清空积攒的令牌，
+    succeeded() 时按初始速率的 1/20 逐步恢复，不超过初始速率。
+    """
+
+    def __init__(self, rate: float, min_rate: float = 0.5):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# 当前线程正在统计的 (ProviderMetrics, 资源类型)
+_metrics_context = threading.local()
+
+
+def record_metrics(**counts):
+    """把计数累加到当前线程正在统计的资源类型，不在统计范围内时忽略"""
+    current = getattr(_metrics_context, "current", None)
+    if current is not None:
+        current[0].add(current[1], **counts)
+
+
+class ProviderMetrics:
+    """按资源类型累计的指标：执行次数、耗时、API 调用次数、翻页数、响应字节数、缓存命中/未命中及错误数
+
+    track(name) 期间当前线程上的 record_metrics() 计入该资源类型；
+    propagate(fn) 把调用方正在统计的资源类型带入线程池中执行的子任务。
+    """
+
+    FIELDS = ["runs", "seconds", "api_calls", "pages", "bytes", "cache_hits", "cache_misses", "errors"]
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, **counts):
+        with self._lock:
+            totals = self._totals.get(name)
+            if totals is None:
+                totals = self._totals[name] = dict.fromkeys(self.FIELDS, 0)
+            for field, value in counts.items():
+                totals[field] += value
+
+    @contextmanager
+    def track(self, name: str):
+        previous = getattr(_metrics_context, "current", None)
+        _metrics_context.current = (self, name)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, runs=1, seconds=time.monotonic() - start)
+            _metrics_context.current = previous
+
+    def bind(self, name: str, fn: Callable) -> Callable:
+        def run(*args, **kwargs):
+            with self.track(name):
+                return fn(*args, **kwargs)
+        return run
+
+    @staticmethod
+    def propagate(fn: Callable) -> Callable:
+        current = getattr(_metrics_context, "current", None)
+
+        def run(*args, **kwargs):
+            previous = getattr(_metrics_context, "current", None)
+            _metrics_context.current = current
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _metrics_context.current = previous
+        return run
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(totals) for name, totals in self._totals.items()}
+
+    def since(self, before: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        """与之前的 snapshot() 相比的增量，只包含有变化的资源类型"""
+        delta = {}
+        for name, totals in self.snapshot().items():
+            base = before.get(name, {})
+            if totals != base:
+                delta[name] = {field: value - base.get(field, 0) for field, value in totals.items()}
+        return delta
+
+    def prometheus(self, prefix: str = "ip_locator_provider") -> List[str]:
+        lines = []
+        totals = self.snapshot()
+        for field in self.FIELDS:
+            name = f"{prefix}_{field}_total"
+            lines.append(f"# TYPE {name} counter")
+            for provider, values in totals.items():
+                lines.append(f'{name}{{provider="{provider}"}} {values[field]:g}')
+        return lines
+
+
+class InventorySnapshot:
+    """资源清单的 SQLite 快照：每个数据源一行，保存拉取时间和索引条目 {(标准化 IP, 资源信息指纹): 资源信息}
+
+    同一资源的多个 IP 共享一条资源信息及其指纹，加载后仍是同一个对象；加载时无需重新标准化 IP 和计算指纹。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                "provider TEXT NOT NULL, region TEXT NOT NULL, fetched_at REAL NOT NULL, payload TEXT NOT NULL, "
+                "PRIMARY KEY (provider, region))")
+
+    def save(self, source: Tuple[str, Optional[str]], fetched_at: float, entries: Dict[Tuple[str, str], Dict]):
+        records: List[Dict] = []
+        fingerprints: List[str] = []
+        record_ids: Dict[int, int] = {}
+        keys, refs = [], []
+        for (key, fingerprint), record in entries.items():
+            ref = record_ids.get(id(record))
+            if ref is None:
+                ref = record_ids[id(record)] = len(records)
+                records.append(record)
+                fingerprints.append(fingerprint)
+            keys.append(key)
+            refs.append(ref)
+        payload = json.dumps({"records": records, "fingerprints": fingerprints, "keys": keys, "refs": refs},
+                             ensure_ascii=False, default=str)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                               (source[0], source[1] or '', fetched_at, payload))
+
+    def touch(self, source: Tuple[str, Optional[str]], fetched_at: float) -> bool:
+        """清单未变化时只更新拉取时间，快照中没有该数据源时返回 False"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("UPDATE sources SET fetched_at = ? WHERE provider = ? AND region = ?",
+                                        (fetched_at, source[0], source[1] or ''))
+            return cursor.rowcount > 0
+
+    def load(self) -> Iterator[Tuple[Tuple[str, Optional[str]], float, Dict[Tuple[str, str], Dict]]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT provider, region, fetched_at, payload FROM sources").fetchall()
+        for provider, region, fetched_at, payload in rows:
+            data = json.loads(payload)
+            if "fingerprints" not in data:
+                # 旧格式（未保存指纹）的数据源不加载，按缺失数据源重新拉取
+                continue
+            records, fingerprints = data["records"], data["fingerprints"]
+            entries = {(key, fingerprints[ref]): records[ref] for key, ref in zip(data["keys"], data["refs"])}
+            yield (provider, region or None), fetched_at, entries
+
+
+class SortedIPIndex:
+    """按整数排序的紧凑 IP 数组，支持 bisect 区间（CIDR）查询
+
+    IPv4 以 32 位无符号整数存放在 array('I') 中；IPv6 拆成高低两个 64 位整数存放在 array('Q') 中。
+    每个地址对应 refs 中的下标，指向去重后的 (资源类型, 资源信息) 列表。
+    """
+    _MASK64 = (1 << 64) - 1
+
+    def __init__(self, entries: Iterable[Tuple[str, str, Dict]]):
+        records: List[Tuple[str, Dict]] = []
+        record_ids: Dict[int, int] = {}
+        v4, v6 = [], []
+        for ip, name, record in entries:
+            ref = record_ids.get(id(record))
+            if ref is None:
+                ref = record_ids[id(record)] = len(records)
+                records.append((name, record))
+            addr = ipaddress.ip_address(ip)
+            (v4 if addr.version == 4 else v6).append((int(addr), ref))
+        v4.sort()
+        v6.sort()
+
+        self._records = records
+        self._v4_keys = array('I', (key for key, _ in v4))
+        self._v4_refs = array('I', (ref for _, ref in v4))
+        self._v6_high = array('Q', (key >> 64 for key, _ in v6))
+        self._v6_low = array('Q', (key & self._MASK64 for key, _ in v6))
+        self._v6_refs = array('I', (ref for _, ref in v6))
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self._v4_keys) + len(self._v6_refs)
+
+    def _v6_key(self, i: int) -> int:
+        return (self._v6_high[i] << 64) | self._v6_low[i]
+
+    def query(self, network: ipaddress._BaseNetwork) -> Iterator[Tuple[str, str, Dict]]:
+        """返回网段内的所有 (IP, 资源类型, 资源信息)"""
+        first, last = int(network.network_address), int(network.broadcast_address)
+        if network.version == 4:
+            lo = bisect_left(self._v4_keys, first)
+            hi = bisect_right(self._v4_keys, last)
+            for i in range(lo, hi):
+                name, record = self._records[self._v4_refs[i]]
+                yield str(ipaddress.IPv4Address(self._v4_keys[i])), name, record
+        else:
+            positions = range(len(self._v6_refs))
+            lo = bisect_left(positions, first, key=self._v6_key)
+            hi = bisect_right(positions, last, key=self._v6_key)
+            for i in range(lo, hi):
+                name, record = self._records[self._v6_refs[i]]
+                yield ipaddress.IPv6Address(self._v6_key(i)).compressed, name, record
+
+
+class PodRecord:
+    """Pod 的投影，只保留定位用到的字段；__slots__ 省去每个实例的 __dict__，大集群下缓存占用显著减少"""
+
+    __slots__ = ("cluster_id", "namespace", "pod_name", "container_name", "host_ip", "pod_ip", "status")
+
+    def __init__(self, cluster_id: str, pod: Dict):
+        """从 Pod 的原始 JSON（而非 kubernetes 模型对象）提取字段"""
+        metadata = pod.get("metadata") or {}
+        containers = (pod.get("spec") or {}).get("containers") or []
+        status = pod.get("status") or {}
+        self.cluster_id = cluster_id
+        self.namespace = metadata.get("namespace")
+        self.pod_name = metadata.get("name")
+        self.container_name = containers[0].get("name") if containers else None
+        self.host_ip = status.get("hostIP")
+        self.pod_ip = status.get("podIP")
+        self.status = status.get("phase")
+
+    def to_dict(self) -> Dict:
+        return {
+            "type": "EKS",
+            "cluster_id": self.cluster_id,
+            "namespace": self.namespace,
+            "pod_name": self.pod_name,
+            "container_name": self.container_name,
+            "host_ip": self.host_ip,
+            "pod_ip": self.pod_ip,
+            "status": self.status
+        }
+
+
+def list_pod_pages(v1: k8s_client.CoreV1Api, limit: int, field_selector: Optional[str] = None) -> Iterator[Dict]:
+    """按 limit/continue 分页列出所有命名空间的 Pod，逐页产出原始 JSON
+
+    使用 _preload_content=False 直接解析响应体，不反序列化为 kubernetes 模型对象；
+    每页处理完即可释放，内存占用与单页大小而非集群规模相关。
+    """
+    token = None
+    while True:
+        kwargs = {"limit": limit, "_preload_content": False}
+        if token:
+            kwargs["_continue"] = token
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+        record_metrics(api_calls=1, pages=1)
+        body = v1.list_pod_for_all_namespaces(watch=False, **kwargs).data
+        record_metrics(bytes=len(body))
+        page = json.loads(body)
+        del body
+        yield page
+        token = (page.get("metadata") or {}).get("continue")
+        if not token:
+            break
+
+
+class PodInformer:
+    """单个 K8s 上下文的 Pod 缓存
+
+    首次分页全量 list 后通过 watch 增量维护 Pod IP -> PodRecord 映射，resourceVersion 过期（410）时重新 list。
+    """
+
+    def __init__(self, ctx_name: str, v1: k8s_client.CoreV1Api, page_limit: int = 500, watch_timeout: int = 300):
+        self.ctx_name = ctx_name
+        self.page_limit = page_limit
+        self.watch_timeout = watch_timeout
+        self._v1 = v1
+        self._pods: Dict[str, Tuple[Optional[str], PodRecord]] = {}
+        self._by_ip: Dict[str, Dict[str, PodRecord]] = {}
+        self._resource_version: Optional[str] = None
+        # 每次 Pod 缓存变化时递增，供网段索引判断是否需要重建
+        self.version = 0
+        self._lock = threading.Lock()
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._watch: Optional[k8s_watch.Watch] = None
+        self._thread = threading.Thread(target=self._run, name=f"pod-informer-{ctx_name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._watch:
+            self._watch.stop()
+
+    def wait_synced(self, timeout: float) -> bool:
+        return self._synced.wait(timeout)
+
+    def lookup(self, ip: str) -> List[Dict]:
+        with self._lock:
+            return [record.to_dict() for record in self._by_ip.get(ip, {}).values()]
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            return [(ip, record.to_dict()) for ip, record in self._pods.values() if ip]
+
+    def _upsert(self, pod: Dict):
+        uid = pod["metadata"]["uid"]
+        record = PodRecord(self.ctx_name, pod)
+        ip = normalize_ip(record.pod_ip)
+        with self._lock:
+            self._discard(uid)
+            self._pods[uid] = (ip, record)
+            if ip:
+                self._by_ip.setdefault(ip, {})[uid] = record
+            self.version += 1
+
+    def _discard(self, uid: str):
+        old = self._pods.pop(uid, None)
+        if old and old[0]:
+            bucket = self._by_ip.get(old[0], {})
+            bucket.pop(uid, None)
+            if not bucket:
+                self._by_ip.pop(old[0], None)
+
+    def _relist(self):
+        for attempt in range(2):
+            pods, by_ip = {}, {}
+            try:
+                for page in list_pod_pages(self._v1, self.page_limit):
+                    for pod in page.get("items") or []:
+                        uid = pod["metadata"]["uid"]
+                        record = PodRecord(self.ctx_name, pod)
+                        ip = normalize_ip(record.pod_ip)
+                        pods[uid] = (ip, record)
+                        if ip:
+                            by_ip.setdefault(ip, {})[uid] = record
+                    resource_version = page["metadata"].get("resourceVersion")
+                break
+            except ApiException as e:
+                # 分页期间 continue 令牌过期（410）时从头重新 list 一次
+                if e.status != 410 or attempt:
+                    raise
+                logger.info(f"K8s 上下文 {self.ctx_name} 分页令牌已过期，重新全量同步")
+        with self._lock:
+            self._pods, self._by_ip = pods, by_ip
+            self.version += 1
+        self._resource_version = resource_version
+        self._synced.set()
+        logger.info(f"K8s 上下文 {self.ctx_name} Pod 全量同步完成，共 {len(pods)} 个")
+
+    def _handle(self, event: Dict):
+        # 只读取原始 JSON（raw_object）；Watch 的 deserialize=False 无法处理 ERROR 事件，因此不关闭反序列化
+        pod = event['raw_object']
+        if event['type'] == 'DELETED':
+            with self._lock:
+                self._discard(pod['metadata']['uid'])
+                self.version += 1
+        elif event['type'] != 'BOOKMARK':
+            self._upsert(pod)
+        self._resource_version = pod['metadata']['resourceVersion']
+
+    def poll(self, timeout_seconds: int = 1) -> int:
+        """不启动后台线程的增量同步：拉取上次 resourceVersion 之后的变更事件，首次或过期（410）时全量 list
+
+        返回本次处理的事件数（全量 list 时返回 -1）。
+        """
+        if self._resource_version is None:
+            self._relist()
+            return -1
+        events = 0
+        record_metrics(api_calls=1)
+        try:
+            for event in k8s_watch.Watch().stream(self._v1.list_pod_for_all_namespaces,
+                                                  resource_version=self._resource_version,
+                                                  timeout_seconds=timeout_seconds,
+                                                  allow_watch_bookmarks=True):
+                self._handle(event)
+                events += 1
+        except ApiException as e:
+            if e.status != 410:
+                raise
+            logger.info(f"K8s 上下文 {self.ctx_name} resourceVersion 已过期，重新全量同步")
+            self._relist()
+            return -1
+        return events
+
+    def _run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                if self._resource_version is None:
+                    self._relist()
+                self._watch = k8s_watch.Watch()
+                for event in self._watch.stream(self._v1.list_pod_for_all_namespaces,
+                                                resource_version=self._resource_version,
+                                                timeout_seconds=self.watch_timeout,
+                                                allow_watch_bookmarks=True):
+                    self._handle(event)
+                backoff = 1
+            except ApiException as e:
+                if e.status == 410:
+                    logger.info(f"K8s 上下文 {self.ctx_name} resourceVersion 已过期，重新全量同步")
+                    self._resource_version = None
+                    continue
+                logger.error(f"K8s 上下文 {self.ctx_name} watch 发生错误: {str(e)}")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            except Exception as e:
+                logger.error(f"K8s 上下文 {self.ctx_name} watch 发生错误: {str(e)}")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+class ResourceProvider:
+    """资源类型插件
+
+    list_resources(region) 流式产出该资源类型的 (IP, 资源信息)，用于构建索引；
+    query(ip, region, raise_errors) 为单 IP 实时查询（通常借助接口的 IP 过滤条件），未提供时遍历全量清单匹配；
+    query_many(ips, region, raise_errors) 为批量实时查询，返回 IP -> 资源列表，未提供时逐个调用 query，
+    scan_batches 为 True（单 IP 查询本身就要遍历全量清单）或未提供 query 时只遍历一次全量清单。
+    regional 为 False 的资源类型（如 K8s）与地域无关，list_resources/query/query_many 不接收地域参数。
+    """
+
+    def __init__(self, name: str, list_resources: Callable[..., Iterable[Tuple[str, Dict]]],
+                 query: Optional[Callable[..., List[Dict]]] = None, regional: bool = True,
+                 query_many: Optional[Callable[..., Dict[str, List[Dict]]]] = None, scan_batches: bool = False):
+        self.name = name
+        self.regional = regional
+        self._list_resources = list_resources
+        self._query = query
+        self._query_many = query_many
+        self.scan_batches = scan_batches
+
+    def list_resources(self, region: Optional[str] = None) -> Iterable[Tuple[str, Dict]]:
+        return self._list_resources(region) if self.regional else self._list_resources()
+
+    def query(self, ip: str, region: Optional[str] = None, raise_errors: bool = False) -> List[Dict]:
+        if self._query is not None:
+            return self._query(ip, region, raise_errors) if self.regional else self._query(ip, raise_errors)
+
+        try:
+            matched = match_resources([ip], self.list_resources(region))[ip]
+            logger.info(f"{self.name} 匹配 IP {ip}，查询到 {len(matched)} 个")
+            return matched
+        except TencentCloudSDKException as e:
+            logger.error(f"{self.name} 匹配 IP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
+            return []
+
+    def query_many(self, ips: List[str], region: Optional[str] = None,
+                   raise_errors: bool = False) -> Dict[str, List[Dict]]:
+        if self._query_many is not None:
+            return self._query_many(ips, region, raise_errors) if self.regional else self._query_many(ips, raise_errors)
+        if self._query is not None and not (self.scan_batches and len(ips) > 1):
+            return {ip: self.query(ip, region, raise_errors) for ip in ips}
+
+        try:
+            matched = match_resources(ips, self.list_resources(region))
+            logger.info(f"{self.name} 批量匹配 {len(ips)} 个 IP，命中 {sum(1 for items in matched.values() if items)} 个")
+            return matched
+        except TencentCloudSDKException as e:
+            logger.error(f"{self.name} 批量匹配 {len(ips)} 个 IP 发生错误: {str(e)}")
+            if raise_errors:
+                raise
+            return {ip: [] for ip in ips}
+
+
 class TencentCloudIPLocator:
+    CIDR_REBUILD_INTERVAL = 5
+    # 接口默认频率上限（次/秒），未列出的接口使用 API_QPS（多数腾讯云接口默认 20 次/秒）
+    API_QPS_LIMITS = {
+        "cvm.DescribeInstances": 40,
+        "cvm.DescribeRegions": 20
+    }
+    # 被限频（RequestLimitExceeded）时的最大重试次数与退避上限（秒）
+    API_MAX_RETRIES = 5
+    API_BACKOFF_MAX = 10.0
+    PAGE_LIMIT = 100
+    # 多值过滤条件单次请求的取值个数上限：CVM 的 Filter.Values 最多 5 个，CLB 的 LoadBalancerVips 未公布上限，保守取 20
+    FILTER_VALUES_LIMITS = {
+        "clb.DescribeLoadBalancers": 20,
+        "cvm.DescribeInstances": 5
+    }
+    # 单次分页拉取时同时在途的页数上限为并发数的倍数，避免消费慢时积压过多页
+    PAGE_PREFETCH = 2
+    # 并发查询时有任务仍在排队等待线程的轮询间隔（秒）
+    QUEUED_POLL_INTERVAL = 0.05
+    # 非 watch 模式下增量刷新 Pod 时，每个上下文等待变更事件的秒数
+    K8S_POLL_TIMEOUT = 1
+    # K8s 上下文的 Pod 缓存创建失败（如 kubeconfig 中的凭证无效）后，间隔多少秒再重试
+    K8S_INFORMER_RETRY_INTERVAL = 30
+
     def __init__(self):
         # 从 .env 加载腾讯云凭证
         load_dotenv()
         self.secret_id = os.getenv('TENCENTCLOUD_SECRET_ID')
         self.secret_key = os.getenv('TENCENTCLOUD_SECRET_KEY')
         self.region = os.getenv('TENCENTCLOUD_REGION', 'ap-guangzhou')
+        # 多地域模式：逗号分隔的地域列表，或 all 表示自动发现所有可用地域
+        self.regions_setting = os.getenv('TENCENTCLOUD_REGIONS', '')
+        self.max_workers = int(os.getenv('LOCATOR_MAX_WORKERS', '16'))
 
         # 加载 K8s 配置
         self.k8s_config_path = os.getenv('K8S_CONFIG_PATH', '~/.kube/config')
 
+        # K8s watch 模式：每个上下文维护一个 Pod 缓存，查询直接命中内存
+        self.k8s_watch = os.getenv('K8S_WATCH', 'false').lower() == 'true'
+        self.k8s_sync_timeout = float(os.getenv('K8S_SYNC_TIMEOUT', '60'))
+        # Pod 分页 list 的每页数量；单 IP 实时查询是否使用 status.podIP 字段选择器由 API Server 过滤
+        self.k8s_page_limit = int(os.getenv('K8S_PAGE_LIMIT', '500'))
+        self.k8s_pod_ip_selector = os.getenv('K8S_POD_IP_SELECTOR', 'true').lower() == 'true'
+        self._pod_informers: Dict[str, PodInformer] = {}
+        self._pod_informers_lock = threading.Lock()
+        # 每个 Pod 缓存等待首次同步的截止时间（创建时间 + K8S_SYNC_TIMEOUT），及创建失败的上下文下次重试的时间
+        self._pod_informer_deadlines: Dict[str, float] = {}
+        self._pod_informers_retry_at = 0.0
+        # 非 watch 模式下用于增量刷新索引的 Pod 缓存（不启动后台线程）
+        self._pod_pollers: Dict[str, PodInformer] = {}
+        self._k8s_apis: Dict[str, k8s_client.CoreV1Api] = {}
+        self._k8s_lock = threading.Lock()
+
         if not all([self.secret_id, self.secret_key]):
             logger.error("腾讯云凭证未配置，请在 .env 文件中设置 TENCENTCLOUD_SECRET_ID 和 TENCENTCLOUD_SECRET_KEY")
             raise ValueError("Missing Tencent Cloud credentials")
@@ -56,378 +674,1727 @@ class TencentCloudIPLocator:
         # 初始化腾讯云凭证
         self.cred = credential.Credential(self.secret_id, self.secret_key)
 
-    def query_clb_by_ip(self, ip: str) -> List[Dict]:
+        # SDK 客户端注册表：每个 (服务, 地域) 只创建一个客户端，复用其 keep-alive 连接池
+        self._client_factories = {
+            "clb": clb_client.ClbClient,
+            "cvm": cvm_client.CvmClient,
+            "cfs": cfs_client.CfsClient,
+            "mariadb": mariadb_client.MariadbClient,
+            "redis": redis_client.RedisClient,
+            "ckafka": ckafka_client.CkafkaClient,
+            "es": es_client.EsClient,
+            "vpc": vpc_client.VpcClient,
+            "cdb": cdb_client.CdbClient
+        }
+        self._clients: Dict[Tuple[str, str], object] = {}
+        self._clients_lock = threading.Lock()
+        self._clients_created = 0
+        self._clients_reused = 0
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+        # 内存索引：IP -> {(资源类型, 地域): [资源信息]}，按数据源记录拉取时间，超过 TTL 后刷新
+        self.index_ttl = int(os.getenv('IP_INDEX_TTL', '300'))
+        self._index: Dict[str, Dict[Tuple[str, Optional[str]], List[Dict]]] = {}
+        self._sources: Dict[Tuple[str, Optional[str]], Dict] = {}
+        self._index_regions: Optional[List[str]] = None
+        # 网段查询使用的有序数组索引，哈希索引变化后按需重建
+        self._sorted_index: Optional[SortedIPIndex] = None
+        self._sorted_index_key = None
+        self._sorted_index_lock = threading.Lock()
+        self._index_version = 0
+        # 快照模式：启动时从磁盘加载索引，过期数据源在后台线程刷新，查询不等待云 API
+        self._snapshot: Optional[InventorySnapshot] = None
+        self.background_refresh = False
+        self._refresh_lock = threading.Lock()
+        self._index_lock = threading.RLock()
+
+        # CFS 客户端列表按文件系统缓存，并汇总为 客户端 IP / CfsVip -> 文件系统 的反向映射
+        self.cfs_cache_ttl = int(os.getenv('CFS_CACHE_TTL', '600'))
+        self.cfs_max_workers = int(os.getenv('CFS_MAX_WORKERS', '8'))
+        self._cfs_clients = TTLCache(self.cfs_cache_ttl)
+        self._cfs_ip_maps = TTLCache(self.cfs_cache_ttl)
+
+        # CKafka 实例属性按实例缓存，限速并发拉取，并汇总为 VIP -> 实例 的映射
+        self.ckafka_cache_ttl = int(os.getenv('CKAFKA_CACHE_TTL', '600'))
+        self.ckafka_max_workers = int(os.getenv('CKAFKA_MAX_WORKERS', '8'))
+        self._ckafka_attributes = TTLCache(self.ckafka_cache_ttl)
+        self._ckafka_vip_maps = TTLCache(self.ckafka_cache_ttl)
+
+        # 按 (服务, 接口) 共享的自适应限速器，CKafka 实例属性接口沿用 CKAFKA_QPS
+        self.api_qps = float(os.getenv('API_QPS', '20'))
+        # 分页接口读出 TotalCount 后其余页的并发拉取数，1 表示逐页顺序拉取
+        self.page_max_workers = int(os.getenv('PAGE_MAX_WORKERS', '4'))
+        # 各 (服务, 接口, 地域) 全量清单的资源总数，供批量查询规划选择过滤请求或全量遍历
+        self._inventory_totals = TTLCache(self.index_ttl)
+        self._limiters: Dict[str, RateLimiter] = {
+            "ckafka.DescribeInstanceAttributes": RateLimiter(float(os.getenv('CKAFKA_QPS', '10')))
+        }
+
+        # 并发查询时单个资源类型的超时时间（秒）
+        self.provider_timeout = float(os.getenv('PROVIDER_TIMEOUT', '15'))
+
+        # 按资源类型累计的耗时、API 调用、翻页、字节数、缓存及错误指标
+        self.metrics = ProviderMetrics()
+
+        # 资源类型插件，注册顺序即结果中各资源类型的顺序
+        self.providers: Dict[str, ResourceProvider] = {}
+        self._register_builtin_providers()
+
+    # ---------------------- SDK 客户端 ----------------------
+    def get_client(self, service: str, region: Optional[str] = None):
+        """按 (服务, 地域) 懒加载并复用 SDK 客户端"""
+        key = (service, region or self.region)
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients_reused += 1
+                return client
+
+            client_profile = ClientProfile()
+            client_profile.httpProfile = HttpProfile(keepAlive=True)
+            client = self._client_factories[service](self.cred, key[1], client_profile)
+            client.call = self._measured_call(client.call)
+            self._clients[key] = client
+            self._clients_created += 1
+            return client
+
+    @staticmethod
+    def _measured_call(call: Callable) -> Callable:
+        """包装客户端底层的 call，统计响应字节数"""
+        def measured(action, params, options=None, headers=None):
+            body = call(action, params, options=options, headers=headers)
+            record_metrics(bytes=len(body))
+            return body
+        return measured
+
+    def client_stats(self) -> Dict:
+        """客户端与 HTTP 连接的创建/复用计数，用于确认连接池是否生效"""
+        opened = requests = 0
+        with self._clients_lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            session = getattr(getattr(getattr(client, "request", None), "conn", None), "_session", None)
+            for adapter in (session.adapters.values() if session else []):
+                pools = adapter.poolmanager.pools
+                for pool_key in pools.keys():
+                    pool = pools[pool_key]
+                    opened += pool.num_connections
+                    requests += pool.num_requests
+        return {
+            "clients_created": self._clients_created,
+            "clients_reused": self._clients_reused,
+            "connections_opened": opened,
+            "connections_reused": requests - opened
+        }
+
+    def _limiter(self, service: str, action: str) -> RateLimiter:
+        key = f"{service}.{action}"
+        with self._clients_lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = RateLimiter(self.API_QPS_LIMITS.get(key, self.api_qps))
+            return limiter
+
+    def _call(self, service: str, action: str, req, region: Optional[str] = None):
+        """统一的 SDK 调用入口：按接口限速，RequestLimitExceeded 时降速并以带抖动的指数退避重试"""
+        client = self.get_client(service, region)
+        limiter = self._limiter(service, action)
+        for attempt in range(self.API_MAX_RETRIES + 1):
+            limiter.acquire()
+            record_metrics(api_calls=1)
+            try:
+                resp = getattr(client, action)(req)
+            except TencentCloudSDKException as e:
+                if not (e.get_code() or '').startswith('RequestLimitExceeded') or attempt == self.API_MAX_RETRIES:
+                    record_metrics(errors=1)
+                    raise
+                limiter.throttled()
+                delay = random.uniform(0, min(self.API_BACKOFF_MAX, 2 ** attempt))
+                logger.warning(f"{service}.{action} 被限频，速率降至 {limiter.rate:.1f} 次/秒，{delay:.2f}s 后重试")
+                time.sleep(delay)
+                continue
+            limiter.succeeded()
+            return resp
+
+    def api_rates(self) -> Dict[str, float]:
+        """各接口当前的限速速率（次/秒）"""
+        with self._clients_lock:
+            return {key: round(limiter.rate, 2) for key, limiter in self._limiters.items()}
+
+    def _region_lock(self, name: str, region: str) -> threading.Lock:
+        """按 (资源类型, 地域) 分配的锁，避免同一地域的缓存被并发重复构建"""
+        with self._clients_lock:
+            return self._locks.setdefault((name, region), threading.Lock())
+
+    def discover_regions(self) -> List[str]:
+        """通过 CVM DescribeRegions 获取当前账号可用的地域"""
+        resp = self._call("cvm", "DescribeRegions", cvm_models.DescribeRegionsRequest())
+        return [r.Region for r in resp.RegionSet if r.RegionState == "AVAILABLE"]
+
+    def resolve_regions(self, regions: Optional[List[str]] = None) -> List[str]:
+        """确定要查询的地域：显式传入 > TENCENTCLOUD_REGIONS > TENCENTCLOUD_REGION"""
+        if regions is None:
+            regions = [r.strip() for r in self.regions_setting.split(',') if r.strip()]
+        if regions == ['all']:
+            return self.discover_regions()
+        return regions or [self.region]
+
+    # ---------------------- 资源类型插件 ----------------------
+    def register_provider(self, provider: ResourceProvider):
+        """注册资源类型，注册后参与单 IP 查询、并发/多地域查询及索引构建"""
+        self.providers[provider.name] = provider
+
+    def _register_builtin_providers(self):
+        for provider in [
+            ResourceProvider("clb", self.list_clb_resources, self.query_clb_by_ip, query_many=self.query_clb_by_ips),
+            ResourceProvider("cvm", self.list_cvm_resources, self.query_cvm_by_ip, query_many=self.query_cvm_by_ips),
+            ResourceProvider("cfs", self.list_cfs_resources, self.query_cfs_by_ip),
+            ResourceProvider("mariadb", self.list_mariadb_resources, self.query_mariadb_by_ip, scan_batches=True),
+            ResourceProvider("redis", self.list_redis_resources, self.query_redis_by_ip, scan_batches=True),
+            ResourceProvider("ckafka", self.list_ckafka_resources, self.query_ckafka_by_ip),
+            ResourceProvider("elasticsearch", self.list_es_resources, self.query_es_by_ip, scan_batches=True),
+            ResourceProvider("eip", self.list_eip_resources, self.query_eip_by_ip, query_many=self._per_ip_or_scan(
+                "vpc.DescribeAddresses", vpc_models.DescribeAddressesRequest,
+                self.query_eip_by_ip, self.list_eip_resources)),
+            ResourceProvider("eni", self.list_eni_resources, self.query_eni_by_ip, query_many=self._per_ip_or_scan(
+                "vpc.DescribeNetworkInterfaces", vpc_models.DescribeNetworkInterfacesRequest,
+                self.query_eni_by_ip, self.list_eni_resources)),
+            ResourceProvider("nat", self.list_nat_resources),
+            ResourceProvider("cdb", self.list_cdb_resources, self.query_cdb_by_ip, query_many=self._per_ip_or_scan(
+                "cdb.DescribeDBInstances", cdb_models.DescribeDBInstancesRequest,
+                self.query_cdb_by_ip, self.list_cdb_resources)),
+            ResourceProvider("k8s", self.list_k8s_resources, self.query_k8s_pods_by_ip, regional=False,
+                             scan_batches=True)
+        ]:
+            self.register_provider(provider)
+
+    # ---------------------- 资源信息构造 ----------------------
+    @staticmethod
+    def _clb_record(lb) -> Dict:
+        return {
+            "type": "CLB",
+            "instance_id": lb.LoadBalancerId,
+            "instance_name": lb.LoadBalancerName,
+            "vip": lb.LoadBalancerVips[0] if lb.LoadBalancerVips else None,
+            "status": lb.Status,
+            "region": lb.Zones
+        }
+
+    @staticmethod
+    def _cvm_record(instance) -> Dict:
+        return {
+            "type": "CVM",
+            "instance_id": instance.InstanceId,
+            "instance_name": instance.InstanceName,
+            "private_ip": instance.PrivateIpAddresses[0] if instance.PrivateIpAddresses else None,
+            "public_ip": instance.PublicIpAddresses[0] if instance.PublicIpAddresses else None,
+            "region": instance.Placement.Zone,
+            "status": instance.InstanceState,
+            "create_time": instance.CreatedTime
+        }
+
+    @staticmethod
+    def _cfs_record(fs, client_info) -> Dict:
+        return {
+            "type": "CFS",
+            "instance_id": fs.FileSystemId,
+            "instance_name": fs.FsName,
+            "vip": client_info.CfsVip,
+            "client_ip": client_info.ClientIp,
+            "region": fs.Zone,
+            "status": fs.LifeCycleState
+        }
+
+    @staticmethod
+    def _mariadb_record(instance) -> Dict:
+        return {
+            "type": "MariaDB",
+            "instance_id": instance.InstanceId,
+            "instance_name": instance.InstanceName,
+            "vip": instance.Vip,
+            "port": instance.Vport,
+            "region": instance.Region,
+            "status": instance.Status
+        }
+
+    @staticmethod
+    def _redis_record(instance) -> Dict:
+        return {
+            "type": "Redis",
+            "instance_id": instance.InstanceId,
+            "instance_name": instance.InstanceName,
+            "vip": instance.WanIp,
+            "port": instance.Port,
+            "region": instance.Region,
+            "status": instance.Status
+        }
+
+    @staticmethod
+    def _ckafka_record(instance, attributes) -> Dict:
+        return {
+            "type": "CKafka",
+            "instance_id": instance.InstanceId,
+            "instance_name": instance.InstanceName,
+            "vip": attributes.Vip,
+            "port": attributes.Vport,
+            "region": "N/A",
+            "status": instance.Status
+        }
+
+    @staticmethod
+    def _es_record(instance, kibana: bool = False) -> Dict:
+        return {
+            "type": "Elasticsearch",
+            "instance_id": instance.InstanceId,
+            "instance_name": instance.InstanceName,
+            "vip": instance.KibanaPrivateAccess if kibana else instance.EsVip,
+            "port": "N/A" if kibana else instance.EsPort,
+            "region": instance.Zone,
+            "status": instance.Status
+        }
+
+    @staticmethod
+    def _eip_record(address) -> Dict:
+        return {
+            "type": "EIP",
+            "instance_id": address.AddressId,
+            "instance_name": address.AddressName,
+            "public_ip": address.AddressIp,
+            "private_ip": address.PrivateAddressIp,
+            "bound_instance": address.InstanceId,
+            "status": address.AddressStatus
+        }
+
+    @staticmethod
+    def _eni_record(eni) -> Dict:
+        primary = next((item for item in eni.PrivateIpAddressSet or [] if item.Primary), None)
+        return {
+            "type": "ENI",
+            "instance_id": eni.NetworkInterfaceId,
+            "instance_name": eni.NetworkInterfaceName,
+            "private_ip": primary.PrivateIpAddress if primary else None,
+            "bound_instance": eni.Attachment.InstanceId if eni.Attachment else None,
+            "region": eni.Zone,
+            "status": eni.State
+        }
+
+    @staticmethod
+    def _eni_ips(eni) -> List[str]:
+        """弹性网卡上的内网 IPv4、绑定的公网 IP 及 IPv6 地址"""
+        ips = []
+        for item in eni.PrivateIpAddressSet or []:
+            ips.extend([item.PrivateIpAddress, item.PublicIpAddress])
+        ips.extend(item.Address for item in eni.Ipv6AddressSet or [])
+        return [ip for ip in ips if ip]
+
+    @staticmethod
+    def _nat_record(nat) -> Dict:
+        return {
+            "type": "NAT",
+            "instance_id": nat.NatGatewayId,
+            "instance_name": nat.NatGatewayName,
+            "public_ip": [address.PublicIpAddress for address in nat.PublicIpAddressSet or []],
+            "region": nat.Zone,
+            "status": nat.State
+        }
+
+    @staticmethod
+    def _cdb_record(instance) -> Dict:
+        return {
+            "type": "CDB",
+            "instance_id": instance.InstanceId,
+            "instance_name": instance.InstanceName,
+            "vip": instance.Vip,
+            "port": instance.Vport,
+            "region": instance.Zone,
+            "status": instance.Status
+        }
+
+    def query_clb_by_ip(self, ip: str, region: Optional[str] = None,
+                        raise_errors: bool = False) -> List[Dict]:
         """查询 CLB 负载均衡"""
+        clb_instances = self.query_clb_by_ips([ip], region, raise_errors)[ip]
+        logger.info(f"CLB 匹配 IP {ip}，查询到 {len(clb_instances)} 个")
+        return clb_instances
+
+    def query_clb_by_ips(self, ips: List[str], region: Optional[str] = None,
+                         raise_errors: bool = False) -> Dict[str, List[Dict]]:
+        """批量查询 CLB：多个 VIP 合并为一次 LoadBalancerVips 过滤请求，不指定类型同时匹配公网与内网；
+        过滤请求数多于全量清单页数时改为遍历全量清单"""
         try:
-            client = clb_client.ClbClient(self.cred, self.region)
-
-            req = clb_models.DescribeLoadBalancersRequest()
-            req.LoadBalancerType = "OPEN"  # 公网类型
-            req.LoadBalancerVips = [ip]
-
-            resp = client.DescribeLoadBalancers(req)
-            clb_instances = []
-
-            for lb in resp.LoadBalancerSet:
-                clb_instances.append({
-                    "type": "CLB",
-                    "instance_id": lb.LoadBalancerId,
-                    "instance_name": lb.LoadBalancerName,
-                    "vip": lb.LoadBalancerVips[0] if lb.LoadBalancerVips else None,
-                    "status": lb.Status,
-                    "region": lb.Zones
-                })
-
-            if not clb_instances:
-                req = clb_models.DescribeLoadBalancersRequest()
-                req.LoadBalancerType = "INTERNAL"  # 内网类型
-                req.LoadBalancerVips = [ip]
-
-                resp = client.DescribeLoadBalancers(req)
-                for lb in resp.LoadBalancerSet:
-                    clb_instances.append({
-                        "type": "CLB",
-                        "instance_id": lb.LoadBalancerId,
-                        "instance_name": lb.LoadBalancerName,
-                        "vip": lb.LoadBalancerVips[0] if lb.LoadBalancerVips else None,
-                        "status": lb.Status,
-                        "region": lb.Zones
-                    })
-
-            logger.info(f"CLB 匹配 IP {ip}，查询到 {len(clb_instances)} 个")
-            return clb_instances
+            action = "clb.DescribeLoadBalancers"
+            chunks = self._chunk_filter_values(ips, action)
+            if self._prefer_scan(action, clb_models.DescribeLoadBalancersRequest, region, len(chunks)):
+                return match_resources(ips, self.list_clb_resources(region))
+
+            pairs = (pair for chunk in chunks
+                     for pair in self._clb_pairs(self._describe_all(
+                         "clb", "DescribeLoadBalancers", clb_models.DescribeLoadBalancersRequest, "LoadBalancerSet",
+                         region, LoadBalancerVips=chunk)))
+            return match_resources(ips, pairs)
 
         except TencentCloudSDKException as e:
-            logger.error(f"CLB 匹配 IP {ip} 发生错误: {str(e)}")
-            return []
+            logger.error(f"CLB 批量匹配 {len(ips)} 个 IP 发生错误: {str(e)}")
+            if raise_errors:
+                raise
+            return {ip: [] for ip in ips}
 
-    def query_cvm_by_ip(self, ip: str) -> List[Dict]:
+    def query_cvm_by_ip(self, ip: str, region: Optional[str] = None,
+                        raise_errors: bool = False) -> List[Dict]:
         """查询 CVM 服务器"""
+        instances = self.query_cvm_by_ips([ip], region, raise_errors)[ip]
+        logger.info(f"CVM 匹配 IP {ip}，查询到 {len(instances)} 个")
+        return instances
+
+    def query_cvm_by_ips(self, ips: List[str], region: Optional[str] = None,
+                         raise_errors: bool = False) -> Dict[str, List[Dict]]:
+        """批量查询 CVM：每 5 个 IP 一次 private-ip-address 过滤请求，未命中的 IP 再按 public-ip-address 批量过滤
+        （同一请求内的多个 Filter 是"与"关系，内外网无法合并到一次请求）；
+        过滤请求数（按最坏情况内外网各一轮估算）多于全量清单页数时改为遍历全量清单"""
         try:
-            client = cvm_client.CvmClient(self.cred, self.region)
-            req = cvm_models.DescribeInstancesRequest()
-            req.Filters = [{"Name": "private-ip-address", "Values": [ip]}]
-
-            resp = client.DescribeInstances(req)
-            instances = []
-            for instance in resp.InstanceSet:
-                instances.append({
-                    "type": "CVM",
-                    "instance_id": instance.InstanceId,
-                    "instance_name": instance.InstanceName,
-                    "private_ip": instance.PrivateIpAddresses[0] if instance.PrivateIpAddresses else None,
-                    "public_ip": instance.PublicIpAddresses[0] if instance.PublicIpAddresses else None,
-                    "region": instance.Placement.Zone,
-                    "status": instance.InstanceState,
-                    "create_time": instance.CreatedTime
-                })
-
-            if not instances:
-                req = cvm_models.DescribeInstancesRequest()
-                req.Filters = [{"Name": "public-ip-address", "Values": [ip]}]
-
-                resp = client.DescribeInstances(req)
-                instances = []
-                for instance in resp.InstanceSet:
-                    instances.append({
-                        "type": "CVM",
-                        "instance_id": instance.InstanceId,
-                        "instance_name": instance.InstanceName,
-                        "private_ip": instance.PrivateIpAddresses[0] if instance.PrivateIpAddresses else None,
-                        "public_ip": instance.PublicIpAddresses[0] if instance.PublicIpAddresses else None,
-                        "region": instance.Placement.Zone,
-                        "status": instance.InstanceState,
-                        "create_time": instance.CreatedTime
-                    })
-
-            logger.info(f"CVM 匹配 IP {ip}，查询到 {len(instances)} 个")
-            return instances
+            action = "cvm.DescribeInstances"
+            chunks = self._chunk_filter_values(ips, action)
+            if self._prefer_scan(action, cvm_models.DescribeInstancesRequest, region, 2 * len(chunks)):
+                return match_resources(ips, self.list_cvm_resources(region))
+
+            result: Dict[str, List[Dict]] = {}
+            pending = ips
+            for filter_name in ("private-ip-address", "public-ip-address"):
+                pairs = (pair for chunk in chunks
+                         for pair in self._cvm_pairs(self._describe_all(
+                             "cvm", "DescribeInstances", cvm_models.DescribeInstancesRequest, "InstanceSet", region,
+                             Filters=[{"Name": filter_name, "Values": chunk}])))
+                for ip, instances in match_resources(pending, pairs).items():
+                    if instances:
+                        result[ip] = instances
+                pending = [ip for ip in pending if ip not in result]
+                chunks = self._chunk_filter_values(pending, action)
+                if not chunks:
+                    break
+            result.update((ip, []) for ip in pending)
+            return result
+
         except TencentCloudSDKException as e:
-            logger.error(f"CVM 匹配 IP {ip} 发生错误: {str(e)}")
-            return []
+            logger.error(f"CVM 批量匹配 {len(ips)} 个 IP 发生错误: {str(e)}")
+            if raise_errors:
+                raise
+            return {ip: [] for ip in ips}
 
-    def query_cfs_by_ip(self, ip: str) -> List[Dict]:
+    def query_cfs_by_ip(self, ip: str, region: Optional[str] = None,
+                        raise_errors: bool = False) -> List[Dict]:
         """查询 CFS 文件系统"""
         try:
-            client = cfs_client.CfsClient(self.cred, self.region)
-            req = cfs_models.DescribeCfsFileSystemsRequest()
-            resp = client.DescribeCfsFileSystems(req)
-
-            matched_instances = []
-            for fs in resp.FileSystems:
-                client_req = cfs_models.DescribeCfsFileSystemClientsRequest()
-                client_req.FileSystemId = fs.FileSystemId
-                client_resp = client.DescribeCfsFileSystemClients(client_req)
-
-                for client_info in client_resp.ClientList:
-                    if client_info.ClientIp == ip or client_info.CfsVip == ip:
-                        matched_instances.append({
-                            "type": "CFS",
-                            "instance_id": fs.FileSystemId,
-                            "instance_name": fs.FsName,
-                            "vip": client_info.CfsVip,
-                            "client_ip": client_info.ClientIp,
-                            "region": fs.Zone,
-                            "status": fs.LifeCycleState
-                        })
-
+            matched_instances = list(self._load_cfs_ip_map(region).get(normalize_ip(ip), []))
             logger.info(f"CFS 匹配 IP {ip}，查询到 {len(matched_instances)} 个")
             return matched_instances
 
         except TencentCloudSDKException as e:
             logger.error(f"CFS 匹配 IP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
-    def query_mariadb_by_ip(self, ip: str) -> List[Dict]:
+    @staticmethod
+    def _fetch_cached(cache: TTLCache, keys: List[str], fetch: Callable, max_workers: int,
+                      force: bool = False) -> Tuple[Dict, int]:
+        """按键读取缓存，缺失或过期的键用线程池并发拉取并写回缓存，返回 (结果, 拉取次数)"""
+        results = {}
+        pending = []
+        for key in keys:
+            cached = None if force else cache.get(key)
+            if cached is None:
+                pending.append(key)
+            else:
+                results[key] = cached
+        record_metrics(cache_hits=len(results), cache_misses=len(pending))
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for key, value in zip(pending, executor.map(ProviderMetrics.propagate(fetch), pending)):
+                    cache.set(key, value)
+                    results[key] = value
+        return results, len(pending)
+
+    def _fetch_cfs_clients(self, region: str, fs_id: str) -> List:
+        """分页获取单个文件系统的客户端列表"""
+        return list(self._describe_all("cfs", "DescribeCfsFileSystemClients",
+                                       cfs_models.DescribeCfsFileSystemClientsRequest, "ClientList", region,
+                                       FileSystemId=fs_id))
+
+    def _load_cfs_ip_map(self, region: Optional[str] = None, force: bool = False) -> Dict[str, List[Dict]]:
+        """构建 客户端 IP / CfsVip -> 文件系统 的反向映射
+
+        映射在 CFS_CACHE_TTL 内直接复用；过期后只重新列出文件系统，
+        客户端列表仅对缓存过期或新增的文件系统并发拉取（并发数 CFS_MAX_WORKERS）
+        """
+        region = region or self.region
+        with self._region_lock("cfs", region):
+            ip_map = None if force else self._cfs_ip_maps.get(region)
+            if ip_map is not None:
+                record_metrics(cache_hits=1)
+                return ip_map
+            record_metrics(cache_misses=1)
+
+            file_systems = list(self._describe_all("cfs", "DescribeCfsFileSystems",
+                                                   cfs_models.DescribeCfsFileSystemsRequest, "FileSystems", region))
+            fs_ids = [fs.FileSystemId for fs in file_systems]
+            self._cfs_clients.prune()
+            client_lists, fetched = self._fetch_cached(
+                self._cfs_clients, fs_ids, lambda fs_id: self._fetch_cfs_clients(region, fs_id),
+                self.cfs_max_workers, force)
+
+            ip_map: Dict[str, List[Dict]] = {}
+            for fs in file_systems:
+                for client_info in client_lists[fs.FileSystemId]:
+                    record = self._cfs_record(fs, client_info)
+                    for ip in {normalize_ip(client_info.ClientIp), normalize_ip(client_info.CfsVip)} - {None}:
+                        ip_map.setdefault(ip, []).append(record)
+
+            logger.info(f"CFS 反向映射已刷新（{region}），{len(file_systems)} 个文件系统，拉取客户端列表 {fetched} 次")
+            self._cfs_ip_maps.set(region, ip_map)
+            return ip_map
+
+    def query_mariadb_by_ip(self, ip: str, region: Optional[str] = None,
+                            raise_errors: bool = False) -> List[Dict]:
         """查询 MariaDB 数据库"""
         try:
-            client = mariadb_client.MariadbClient(self.cred, self.region)
-            req = mariadb_models.DescribeDBInstancesRequest()
-            resp = client.DescribeDBInstances(req)
             matched_instances = []
-            for instance in resp.Instances:
+            # 接口无 VIP 精确过滤条件，分页拉取全部实例后比对
+            for instance in self._describe_all("mariadb", "DescribeDBInstances",
+                                               mariadb_models.DescribeDBInstancesRequest, "Instances", region):
                 if instance.Vip == ip:
-                    matched_instances.append({
-                        "type": "MariaDB",
-                        "instance_id": instance.InstanceId,
-                        "instance_name": instance.InstanceName,
-                        "vip": instance.Vip,
-                        "port": instance.Vport,
-                        "region": instance.Region,
-                        "status": instance.Status
-                    })
+                    matched_instances.append(self._mariadb_record(instance))
             logger.info(f"MariaDB 匹配 VIP {ip}，查询到 {len(matched_instances)} 个")
             return matched_instances
         except TencentCloudSDKException as e:
             logger.error(f"MariaDB 匹配 VIP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
-    def query_redis_by_ip(self, ip: str) -> List[Dict]:
+    def query_redis_by_ip(self, ip: str, region: Optional[str] = None,
+                          raise_errors: bool = False) -> List[Dict]:
         """查询 Redis 数据库"""
         try:
-            client = redis_client.RedisClient(self.cred, self.region)
-            req = redis_models.DescribeInstancesRequest()
-            resp = client.DescribeInstances(req)
-
             matched_instances = []
-            for instance in resp.InstanceSet:
+            for instance in self._describe_all("redis", "DescribeInstances", redis_models.DescribeInstancesRequest,
+                                               "InstanceSet", region):
                 if instance.WanIp == ip or instance.Vip6 == ip:
-                    matched_instances.append({
-                        "type": "Redis",
-                        "instance_id": instance.InstanceId,
-                        "instance_name": instance.InstanceName,
-                        "vip": instance.WanIp,
-                        "port": instance.Port,
-                        "region": instance.Region,
-                        "status": instance.Status
-                    })
+                    matched_instances.append(self._redis_record(instance))
 
             logger.info(f"Redis 实例匹配 IP {ip}，查询到 {len(matched_instances)} 个")
             return matched_instances
 
         except TencentCloudSDKException as e:
             logger.error(f"Redis 实例匹配 IP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
-    def query_ckafka_by_ip(self, ip: str) -> List[Dict]:
+    def query_ckafka_by_ip(self, ip: str, region: Optional[str] = None,
+                           raise_errors: bool = False) -> List[Dict]:
         """查询 CKafka 消息队列"""
         try:
-            client = ckafka_client.CkafkaClient(self.cred, self.region)
-            req = ckafka_models.DescribeInstanceAttributesRequest()
-
-            list_req = ckafka_models.DescribeInstancesRequest()
-            list_resp = client.DescribeInstances(list_req)
-
-            matched_instances = []
-            for instance in list_resp.Result.InstanceList:
-                req.InstanceId = instance.InstanceId
-                resp = client.DescribeInstanceAttributes(req)
-
-                if resp.Result.Vip == ip:
-                    matched_instances.append({
-                        "type": "CKafka",
-                        "instance_id": instance.InstanceId,
-                        "instance_name": instance.InstanceName,
-                        "vip": resp.Result.Vip,
-                        "port": resp.Result.Vport,
-                        "region": "N/A",
-                        "status": instance.Status
-                    })
-
+            matched_instances = list(self._load_ckafka_vip_map(region).get(normalize_ip(ip), []))
             logger.info(f"CKafka 匹配 IP {ip}，查询到 {len(matched_instances)} 个")
             return matched_instances
 
         except TencentCloudSDKException as e:
             logger.error(f"CKafka 匹配 IP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
-    def query_es_by_ip(self, ip: str) -> List[Dict]:
+    def _fetch_ckafka_attributes(self, region: str, instance_id: str):
+        """获取单个 CKafka 实例属性，受 CKAFKA_QPS 限速"""
+        req = ckafka_models.DescribeInstanceAttributesRequest()
+        req.InstanceId = instance_id
+        return self._call("ckafka", "DescribeInstanceAttributes", req, region).Result
+
+    def _load_ckafka_vip_map(self, region: Optional[str] = None, force: bool = False) -> Dict[str, List[Dict]]:
+        """构建 VIP -> CKafka 实例 的映射
+
+        实例列表完整分页；实例属性按 InstanceId 缓存 CKAFKA_CACHE_TTL 秒，
+        仅对过期或新增实例并发拉取（并发数 CKAFKA_MAX_WORKERS，速率 CKAFKA_QPS）
+        """
+        region = region or self.region
+        with self._region_lock("ckafka", region):
+            vip_map = None if force else self._ckafka_vip_maps.get(region)
+            if vip_map is not None:
+                record_metrics(cache_hits=1)
+                return vip_map
+            record_metrics(cache_misses=1)
+
+            def fetch(offset, limit):
+                req = ckafka_models.DescribeInstancesRequest()
+                req.Offset = offset
+                req.Limit = limit
+                resp = self._call("ckafka", "DescribeInstances", req, region)
+                return resp.Result.InstanceList, resp.Result.TotalCount
+
+            instances = list(self._paginate(fetch))
+            instance_ids = [instance.InstanceId for instance in instances]
+            self._ckafka_attributes.prune()
+            attributes, fetched = self._fetch_cached(
+                self._ckafka_attributes, instance_ids,
+                lambda instance_id: self._fetch_ckafka_attributes(region, instance_id),
+                self.ckafka_max_workers, force)
+
+            vip_map: Dict[str, List[Dict]] = {}
+            for instance in instances:
+                attrs = attributes[instance.InstanceId]
+                record = self._ckafka_record(instance, attrs)
+                vips = {normalize_ip(attrs.Vip)} | {normalize_ip(v.Vip) for v in attrs.VipList or []}
+                for vip in vips - {None}:
+                    vip_map.setdefault(vip, []).append(record)
+
+            logger.info(f"CKafka VIP 映射已刷新（{region}），{len(instances)} 个实例，拉取实例属性 {fetched} 次")
+            self._ckafka_vip_maps.set(region, vip_map)
+            return vip_map
+
+    def query_es_by_ip(self, ip: str, region: Optional[str] = None,
+                       raise_errors: bool = False) -> List[Dict]:
         """查询 Elasticsearch 搜索引擎"""
         try:
-            client = es_client.EsClient(self.cred, self.region)
-            req = es_models.DescribeInstancesRequest()
-            resp = client.DescribeInstances(req)
-
             matched_instances = []
-            for instance in resp.InstanceList:
+            for instance in self._describe_all("es", "DescribeInstances", es_models.DescribeInstancesRequest,
+                                               "InstanceList", region):
                 if instance.KibanaUrl and ip in instance.KibanaUrl:
-                    matched_instances.append({
-                        "type": "Elasticsearch",
-                        "instance_id": instance.InstanceId,
-                        "instance_name": instance.InstanceName,
-                        "vip": instance.KibanaPrivateAccess,
-                        "port": "N/A",
-                        "region": instance.Zone,
-                        "status": instance.Status
-                    })
+                    matched_instances.append(self._es_record(instance, kibana=True))
                 elif instance.EsVip == ip:
-                    matched_instances.append({
-                        "type": "Elasticsearch",
-                        "instance_id": instance.InstanceId,
-                        "instance_name": instance.InstanceName,
-                        "vip": instance.EsVip,
-                        "port": instance.EsPort,
-                        "region": instance.Zone,
-                        "status": instance.Status
-                    })
+                    matched_instances.append(self._es_record(instance))
 
             logger.info(f"Elasticsearch 匹配 IP {ip}，查询到 {len(matched_instances)} 个")
             return matched_instances
 
         except TencentCloudSDKException as e:
             logger.error(f"Elasticsearch 匹配 IP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
-    def query_all_resources(self, ip: str) -> Dict:
-        """查询所有资源类型"""
-        logger.info(f"开始查询 IP {ip} 绑定的资源信息")
-        result = {
-            "ip": ip,
-            "clb": self.query_clb_by_ip(ip),
-            "cvm": self.query_cvm_by_ip(ip),
-            "mariadb": self.query_mariadb_by_ip(ip),
-            "redis": self.query_redis_by_ip(ip),
-            "k8s": self.query_k8s_pods_by_ip(ip)
-        }
-        return result
+    def query_eip_by_ip(self, ip: str, region: Optional[str] = None,
+                        raise_errors: bool = False) -> List[Dict]:
+        """查询弹性公网 IP"""
+        try:
+            addresses = self._describe_all("vpc", "DescribeAddresses", vpc_models.DescribeAddressesRequest,
+                                           "AddressSet", region, Filters=[{"Name": "address-ip", "Values": [ip]}])
+            matched_instances = [self._eip_record(address) for address in addresses if address.AddressIp == ip]
+            logger.info(f"EIP 匹配 IP {ip}，查询到 {len(matched_instances)} 个")
+            return matched_instances
+
+        except TencentCloudSDKException as e:
+            logger.error(f"EIP 匹配 IP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
+            return []
 
-    def query_k8s_pods_by_ip(self, ip: str) -> List[Dict]:
+    def query_eni_by_ip(self, ip: str, region: Optional[str] = None,
+                        raise_errors: bool = False) -> List[Dict]:
+        """查询弹性网卡（按内网 IP 过滤，address-ip 对单个 IP 是后缀模糊匹配，需再精确比对）"""
+        try:
+            enis = self._describe_all("vpc", "DescribeNetworkInterfaces", vpc_models.DescribeNetworkInterfacesRequest,
+                                      "NetworkInterfaceSet", region, Filters=[{"Name": "address-ip", "Values": [ip]}])
+            key = normalize_ip(ip)
+            matched_instances = [self._eni_record(eni) for eni in enis
+                                 if key in {normalize_ip(addr) for addr in self._eni_ips(eni)}]
+            logger.info(f"ENI 匹配 IP {ip}，查询到 {len(matched_instances)} 个")
+            return matched_instances
+
+        except TencentCloudSDKException as e:
+            logger.error(f"ENI 匹配 IP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
+            return []
+
+    def query_cdb_by_ip(self, ip: str, region: Optional[str] = None,
+                        raise_errors: bool = False) -> List[Dict]:
+        """查询云数据库 MySQL"""
+        try:
+            matched_instances = [self._cdb_record(instance) for instance in self._describe_all(
+                "cdb", "DescribeDBInstances", cdb_models.DescribeDBInstancesRequest, "Items", region, Vips=[ip])]
+            logger.info(f"CDB 匹配 VIP {ip}，查询到 {len(matched_instances)} 个")
+            return matched_instances
+
+        except TencentCloudSDKException as e:
+            logger.error(f"CDB 匹配 VIP {ip} 发生错误: {str(e)}")
+            if raise_errors:
+                raise
+            return []
+
+    def query_k8s_pods_by_ip(self, ip: str, raise_errors: bool = False) -> List[Dict]:
         """遍历所有 K8s 上下文查询匹配 IP 的 Pod"""
         matched_pods = []
         try:
-            # 加载 kubeconfig 并获取所有上下文
-            contexts, _ = k8s_config.list_kube_config_contexts(config_file=os.path.expanduser(self.k8s_config_path))
-            if not contexts:
-                logger.warning("K8s 配置文件中未找到任何上下文")
+            if self.k8s_watch:
+                key = normalize_ip(ip)
+                for informer in self.get_pod_informers():
+                    matched_pods.extend(informer.lookup(key))
+                logger.info(f"K8s 匹配 Pod IP {ip}，查询到 {len(matched_pods)} 个")
                 return matched_pods
 
-            for ctx in contexts:
-                ctx_name = ctx['name']
-                try:
-                    # 为每个上下文创建新配置
-                    k8s_config.load_kube_config(context=ctx_name, config_file=os.path.expanduser(self.k8s_config_path))
-                    v1 = k8s_client.CoreV1Api()
-
-                    # 查询所有命名空间的 Pod
-                    ret = v1.list_pod_for_all_namespaces(watch=False)
-                    for pod in ret.items:
-                        if pod.status.pod_ip == ip:
-                            matched_pods.append({
-                                "type": "EKS",
-                                "cluster_id": ctx_name,
-                                "namespace": pod.metadata.namespace,
-                                "pod_name": pod.metadata.name,
-                                "container_name": pod.spec.containers[0].name if pod.spec.containers else None,
-                                "host_ip": pod.status.host_ip,
-                                "pod_ip": pod.status.pod_ip,
-                                "status": pod.status.phase
-                            })
-                except Exception as e:
-                    logger.error(f"查询 K8s 上下文 {ctx_name} 时发生错误: {str(e)}")
-                    continue
+            key = normalize_ip(ip)
+            field_selector = f"status.podIP={key}" if self.k8s_pod_ip_selector else None
+
+            def match(ctx_name: str) -> List[Dict]:
+                # 分页查询所有命名空间的 Pod，开启字段选择器时由 API Server 只返回匹配的 Pod
+                return [PodRecord(ctx_name, pod).to_dict()
+                        for page in list_pod_pages(self.get_k8s_api(ctx_name), self.k8s_page_limit, field_selector)
+                        for pod in page.get("items") or []
+                        if normalize_ip((pod.get("status") or {}).get("podIP")) == key]
 
+            matched_pods = self._map_k8s_contexts(match)
             logger.info(f"K8s 匹配 Pod IP {ip}，查询到 {len(matched_pods)} 个")
             return matched_pods
         except Exception as e:
+            record_metrics(errors=1)
             logger.error(f"K8s 匹配 Pod IP {ip} 发生全局错误: {str(e)}")
+            if raise_errors:
+                raise
             return matched_pods
 
     def query_all_resources(self, ip: str) -> Dict:
         """查询所有资源类型"""
         logger.info(f"开始查询 IP {ip} 绑定的资源信息")
-        result = {
-            "ip": ip,
-            "clb": self.query_clb_by_ip(ip),
-            "cvm": self.query_cvm_by_ip(ip),
-            "cfs": self.query_cfs_by_ip(ip),
-            "mariadb": self.query_mariadb_by_ip(ip),
-            "redis": self.query_redis_by_ip(ip),
-            "ckafka": self.query_ckafka_by_ip(ip),
-            "elasticsearch": self.query_es_by_ip(ip),
-            "k8s": self.query_k8s_pods_by_ip(ip)
-        }
+        result = {"ip": ip}
+        for name, provider in self.providers.items():
+            with self.metrics.track(name):
+                result[name] = provider.query(ip)
         return result
 
+    def _provider_timeout(self, name: str) -> float:
+        """单个资源类型的超时时间，可通过 PROVIDER_TIMEOUT_<类型> 单独覆盖"""
+        return float(os.getenv(f'PROVIDER_TIMEOUT_{name.upper()}', self.provider_timeout))
+
+    def _run_concurrently(self, tasks: Dict[str, Callable[[], List]],
+                          max_workers: Optional[int] = None) -> Tuple[Dict[str, List], Dict[str, str]]:
+        """并发执行查询任务，返回 (结果, 状态)，超时或失败的任务结果为空
+
+        任务名为资源类型，多地域时为 资源类型@地域，超时时间按资源类型取
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(tasks), thread_name_prefix="ip-locator")
+        started: Dict[str, float] = {}
+
+        def run(name: str, task: Callable[[], List]) -> List:
+            # 超时从工作线程开始执行任务时计起，排队等待线程的时间不计入
+            started[name] = time.monotonic()
+            return task()
+
+        pending = {name: executor.submit(run, name, self.metrics.bind(name.split('@')[0], task))
+                   for name, task in tasks.items()}
+
+        results, status = {}, {}
+        while pending:
+            now = time.monotonic()
+            for name, future in list(pending.items()):
+                timeout = self._provider_timeout(name.split('@')[0])
+                if future.done():
+                    del pending[name]
+                    try:
+                        results[name] = future.result()
+                        status[name] = "ok"
+                    except Exception as e:
+                        logger.error(f"{name} 查询失败: {str(e)}")
+                        results[name] = []
+                        status[name] = "error"
+                elif name in started and now - started[name] >= timeout:
+                    del pending[name]
+                    logger.warning(f"{name} 查询超过 {timeout:.0f}s 未返回，跳过")
+                    results[name] = []
+                    status[name] = "timeout"
+            if not pending:
+                break
+            # 等到最近的截止时间或任一任务完成；仍有排队中的任务时短间隔轮询，以便及时记下其开始时间
+            deadlines = [started[name] + self._provider_timeout(name.split('@')[0]) - now
+                         for name in pending if name in started]
+            if len(deadlines) < len(pending):
+                deadlines.append(self.QUEUED_POLL_INTERVAL)
+            wait(pending.values(), timeout=max(min(deadlines), 0), return_when=FIRST_COMPLETED)
+
+        # 超时的查询在后台自行结束，不阻塞本次结果
+        executor.shutdown(wait=False, cancel_futures=True)
+        return {name: results[name] for name in tasks}, {name: status[name] for name in tasks}
+
+    def query_all_resources_concurrent(self, ip: str) -> Dict:
+        """并发查询所有资源类型，结果中的 status 标记每个资源类型为 ok / timeout / error"""
+        logger.info(f"开始并发查询 IP {ip} 绑定的资源信息")
+        tasks = {name: partial(provider.query, ip, raise_errors=True) for name, provider in self.providers.items()}
+        results, status = self._run_concurrently(tasks)
+        return {"ip": ip, **results, "status": status}
+
+    @staticmethod
+    def _query_in_region(query: Callable[..., List[Dict]], ip: str, region: str) -> List[Dict]:
+        return [dict(item, cloud_region=region) for item in query(ip, region, raise_errors=True)]
+
+    def query_all_regions(self, ip: str, regions: Optional[List[str]] = None) -> Dict:
+        """在多个地域并发查询所有资源类型
+
+        所有 (资源类型, 地域) 组合共用一个线程池（并发上限 LOCATOR_MAX_WORKERS），
+        结果按资源类型合并，每条记录以 cloud_region 标注所属地域，status 按 资源类型@地域 记录
+        """
+        regions = self.resolve_regions(regions)
+        logger.info(f"开始在 {len(regions)} 个地域查询 IP {ip} 绑定的资源信息")
+        tasks = {}
+        for name, provider in self.providers.items():
+            if not provider.regional:
+                tasks[name] = partial(provider.query, ip, raise_errors=True)
+                continue
+            for region in regions:
+                tasks[f"{name}@{region}"] = partial(self._query_in_region, provider.query, ip, region)
+        results, status = self._run_concurrently(tasks, max_workers=self.max_workers)
+
+        merged = {"ip": ip, "regions": regions}
+        for name in self.providers:
+            merged[name] = []
+        for task_name, items in results.items():
+            merged[task_name.split('@')[0]].extend(items)
+        merged["status"] = status
+        return merged
+
+    # ---------------------- 批量查询规划 ----------------------
+    def _chunk_filter_values(self, ips: List[str], action: str) -> List[List[str]]:
+        """把 IP 按接口的多值过滤上限分组，每组一次过滤请求"""
+        size = self.FILTER_VALUES_LIMITS.get(action, 1)
+        return [ips[i:i + size] for i in range(0, len(ips), size)]
+
+    def _inventory_total(self, action: str, request_class: type, region: Optional[str] = None) -> int:
+        """全量清单的资源总数：优先取最近一次全量拉取记录的 TotalCount，没有时用 Limit=1 的请求探测"""
+        key = (action, region or self.region)
+        total = self._inventory_totals.get(key)
+        if total is None:
+            service, name = action.split('.', 1)
+            req = request_class()
+            req.Offset = 0
+            req.Limit = 1
+            total = self._call(service, name, req, region).TotalCount or 0
+            self._inventory_totals.set(key, total)
+        return total
+
+    def _prefer_scan(self, action: str, request_class: type, region: Optional[str], filtered_requests: int) -> bool:
+        """比较过滤请求数与全量清单页数，全量遍历更省请求时返回 True
+
+        只有 1～2 次过滤请求（如单 IP 查询）时不值得额外探测总数，直接过滤。
+        """
+        if filtered_requests <= 2 and self._inventory_totals.get((action, region or self.region)) is None:
+            return False
+        scan_pages = max(1, -(-self._inventory_total(action, request_class, region) // self.PAGE_LIMIT))
+        scan = scan_pages <= filtered_requests
+        logger.info(f"{action} 批量查询规划：过滤请求约 {filtered_requests} 次，全量清单 {scan_pages} 页，"
+                    f"采用{'全量遍历' if scan else '过滤请求'}")
+        return scan
+
+    def _per_ip_or_scan(self, action: str, request_class: type, query: Callable[..., List[Dict]],
+                        list_resources: Callable[..., Iterable[Tuple[str, Dict]]]) -> Callable[..., Dict[str, List[Dict]]]:
+        """只支持单值过滤的资源类型：每个 IP 一次过滤请求，请求数多于全量清单页数时改为遍历全量清单"""
+        def query_many(ips: List[str], region: Optional[str] = None, raise_errors: bool = False) -> Dict[str, List[Dict]]:
+            try:
+                if self._prefer_scan(action, request_class, region, len(ips)):
+                    return match_resources(ips, list_resources(region))
+            except TencentCloudSDKException as e:
+                logger.error(f"{action} 批量匹配 {len(ips)} 个 IP 发生错误: {str(e)}")
+                if raise_errors:
+                    raise
+                return {ip: [] for ip in ips}
+            return {ip: query(ip, region, raise_errors) for ip in ips}
+        return query_many
+
+    def _query_many_in_region(self, provider: ResourceProvider, ips: List[str], region: str) -> Dict[str, List[Dict]]:
+        return {ip: [dict(item, cloud_region=region) for item in items]
+                for ip, items in provider.query_many(ips, region, raise_errors=True).items()}
+
+    def query_many(self, ips: Iterable[str], regions: Optional[List[str]] = None) -> List[Dict]:
+        """批量实时查询（不构建索引）：每个 (资源类型, 地域) 对整批 IP 规划一次查询并发执行，按输入顺序返回结果
+
+        CLB/CVM 合并为多值过滤请求，EIP/ENI/CDB 逐个过滤，请求数多于全量清单页数时改为遍历一次全量清单；
+        单 IP 查询本身就要遍历清单的资源类型只遍历一次。
+        """
+        ips = list(ips)
+        valid = list(dict.fromkeys(ip for ip in ips if normalize_ip(ip) is not None))
+        regions = self.resolve_regions(regions)
+        logger.info(f"开始在 {len(regions)} 个地域批量查询 {len(valid)} 个 IP 绑定的资源信息")
+        tasks = {}
+        for name, provider in self.providers.items():
+            if not provider.regional:
+                tasks[name] = partial(provider.query_many, valid, raise_errors=True)
+                continue
+            for region in regions:
+                tasks[f"{name}@{region}"] = partial(self._query_many_in_region, provider, valid, region)
+        results, status = self._run_concurrently(tasks, max_workers=self.max_workers) if valid else ({}, {})
+
+        merged = {ip: {"ip": ip, **{name: [] for name in self.providers}} for ip in valid}
+        for task_name, matched in results.items():
+            name = task_name.split('@')[0]
+            # 超时或失败的任务结果为空列表
+            for ip, items in (matched or {}).items():
+                merged[ip][name].extend(items)
+        return [dict(merged[ip], status=status) if ip in merged else {"ip": ip, "error": "invalid ip"} for ip in ips]
+
+    # ---------------------- 全量资源清单 ----------------------
+    def _paginate(self, fetch: Callable[[int, int], Tuple[List, Optional[int]]],
+                  limit: Optional[int] = None) -> Iterator:
+        """按 Offset/Limit 翻页，fetch(offset, limit) 返回 (当前页列表, 总数)
+
+        先拉第一页读出总数，其余页按偏移量并发拉取（并发数 PAGE_MAX_WORKERS），按页序流式产出；
+        接口未返回总数时退化为逐页顺序拉取。
+        """
+        limit = limit or self.PAGE_LIMIT
+        items, total = fetch(0, limit)
+        record_metrics(pages=1)
+        items = items or []
+        yield from items
+        if len(items) < limit:
+            return
+
+        if total is None or self.page_max_workers <= 1:
+            offset = len(items)
+            while total is None or offset < total:
+                items, total = fetch(offset, limit)
+                record_metrics(pages=1)
+                items = items or []
+                yield from items
+                offset += len(items)
+                if len(items) < limit:
+                    break
+            return
+
+        offsets = iter(range(limit, total, limit))
+        fetch_page = ProviderMetrics.propagate(fetch)
+        executor = ThreadPoolExecutor(max_workers=self.page_max_workers, thread_name_prefix="ip-locator-page")
+        try:
+            pending = deque(executor.submit(fetch_page, offset, limit)
+                            for offset in islice(offsets, self.page_max_workers * self.PAGE_PREFETCH))
+            while pending:
+                items, _ = pending.popleft().result()
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(executor.submit(fetch_page, offset, limit))
+                record_metrics(pages=1)
+                yield from items or []
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的页
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _describe_all(self, service: str, action: str, request_class: type, items_field: str,
+                      region: Optional[str] = None, **fields) -> Iterator:
+        """拉取 Offset/Limit 分页的 Describe 接口的全部结果，fields 为额外的请求参数（如过滤条件）"""
+        def fetch(offset, limit):
+            req = request_class()
+            for name, value in fields.items():
+                setattr(req, name, value)
+            req.Offset = offset
+            req.Limit = limit
+            resp = self._call(service, action, req, region)
+            if not fields and offset == 0 and resp.TotalCount is not None:
+                self._inventory_totals.set((f"{service}.{action}", region or self.region), resp.TotalCount)
+            return getattr(resp, items_field), resp.TotalCount
+
+        return self._paginate(fetch)
+
+    def list_clb_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 CLB 全量清单，逐个产出 (IP, 资源信息)"""
+        return self._clb_pairs(self._describe_all("clb", "DescribeLoadBalancers",
+                                                  clb_models.DescribeLoadBalancersRequest, "LoadBalancerSet", region))
+
+    def _clb_pairs(self, lbs: Iterable) -> Iterator[Tuple[str, Dict]]:
+        for lb in lbs:
+            record = self._clb_record(lb)
+            for vip in (lb.LoadBalancerVips or []) + [lb.AddressIPv6]:
+                yield vip, record
+
+    def list_cvm_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 CVM 全量清单，内网、外网及 IPv6 地址均建立索引"""
+        return self._cvm_pairs(self._describe_all("cvm", "DescribeInstances", cvm_models.DescribeInstancesRequest,
+                                                  "InstanceSet", region))
+
+    def _cvm_pairs(self, instances: Iterable) -> Iterator[Tuple[str, Dict]]:
+        for instance in instances:
+            record = self._cvm_record(instance)
+            for ip in (instance.PrivateIpAddresses or []) + (instance.PublicIpAddresses or []) + \
+                    (instance.IPv6Addresses or []):
+                yield ip, record
+
+    def list_cfs_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 CFS 文件系统及其客户端，客户端 IP 与 CfsVip 均建立索引"""
+        return ((ip, record) for ip, records in self._load_cfs_ip_map(region).items() for record in records)
+
+    def list_mariadb_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 MariaDB 全量清单"""
+        return ((instance.Vip, self._mariadb_record(instance))
+                for instance in self._describe_all("mariadb", "DescribeDBInstances",
+                                                   mariadb_models.DescribeDBInstancesRequest, "Instances", region))
+
+    def list_redis_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 Redis 全量清单"""
+        for instance in self._describe_all("redis", "DescribeInstances", redis_models.DescribeInstancesRequest,
+                                           "InstanceSet", region):
+            record = self._redis_record(instance)
+            yield instance.WanIp, record
+            yield instance.Vip6, record
+
+    def list_ckafka_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 CKafka 全量清单及实例 VIP"""
+        return ((ip, record) for ip, records in self._load_ckafka_vip_map(region).items() for record in records)
+
+    def list_es_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 Elasticsearch 全量清单，集群 VIP 与 Kibana 地址均建立索引"""
+        for instance in self._describe_all("es", "DescribeInstances", es_models.DescribeInstancesRequest,
+                                           "InstanceList", region):
+            if instance.KibanaUrl:
+                yield urlparse(instance.KibanaUrl).hostname, self._es_record(instance, kibana=True)
+            yield instance.EsVip, self._es_record(instance)
+
+    def list_eip_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取弹性公网 IP 全量清单"""
+        return ((address.AddressIp, self._eip_record(address))
+                for address in self._describe_all("vpc", "DescribeAddresses", vpc_models.DescribeAddressesRequest,
+                                                  "AddressSet", region))
+
+    def list_eni_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取弹性网卡全量清单，网卡上的内网、公网及 IPv6 地址均建立索引"""
+        for eni in self._describe_all("vpc", "DescribeNetworkInterfaces", vpc_models.DescribeNetworkInterfacesRequest,
+                                      "NetworkInterfaceSet", region):
+            record = self._eni_record(eni)
+            for ip in self._eni_ips(eni):
+                yield ip, record
+
+    def list_nat_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取 NAT 网关全量清单，网关绑定的公网 IP 均建立索引"""
+        for nat in self._describe_all("vpc", "DescribeNatGateways", vpc_models.DescribeNatGatewaysRequest,
+                                      "NatGatewaySet", region):
+            record = self._nat_record(nat)
+            for address in nat.PublicIpAddressSet or []:
+                yield address.PublicIpAddress, record
+
+    def list_cdb_resources(self, region: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """拉取云数据库 MySQL 全量清单，主实例 VIP 与只读 VIP 均建立索引"""
+        for instance in self._describe_all("cdb", "DescribeDBInstances", cdb_models.DescribeDBInstancesRequest,
+                                           "Items", region):
+            record = self._cdb_record(instance)
+            yield instance.Vip, record
+            if instance.RoVipInfo and instance.RoVipInfo.RoVip:
+                yield instance.RoVipInfo.RoVip, record
+
+    def _k8s_contexts(self) -> List[str]:
+        """kubeconfig 中的所有上下文名称"""
+        contexts, _ = k8s_config.list_kube_config_contexts(config_file=os.path.expanduser(self.k8s_config_path))
+        return [ctx['name'] for ctx in contexts or []]
+
+    def get_k8s_api(self, ctx_name: str) -> k8s_client.CoreV1Api:
+        """每个上下文一个独立的 ApiClient，首次使用时创建并复用，不修改进程级默认配置"""
+        with self._k8s_lock:
+            api = self._k8s_apis.get(ctx_name)
+            if api is None:
+                api_client = k8s_config.new_client_from_config(
+                    config_file=os.path.expanduser(self.k8s_config_path), context=ctx_name)
+                api = self._k8s_apis[ctx_name] = k8s_client.CoreV1Api(api_client)
+            return api
+
+    def _map_k8s_contexts(self, fn: Callable[[str], List]) -> List:
+        """并发地对每个上下文执行 fn 并合并结果，单个上下文失败只记录日志"""
+        contexts = self._k8s_contexts()
+        if not contexts:
+            logger.warning("K8s 配置文件中未找到任何上下文")
+            return []
 
-if __name__ == "__main__":
-    try:
-        locator = TencentCloudIPLocator()
+        def run(ctx_name: str) -> List:
+            try:
+                return fn(ctx_name)
+            except Exception as e:
+                record_metrics(errors=1)
+                logger.error(f"查询 K8s 上下文 {ctx_name} 时发生错误: {str(e)}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=min(len(contexts), self.max_workers), thread_name_prefix="k8s") as executor:
+            return [item for items in executor.map(ProviderMetrics.propagate(run), contexts) for item in items]
+
+    def get_pod_informers(self, wait: bool = True) -> List[PodInformer]:
+        """为每个 K8s 上下文启动（一次）Pod 缓存，返回已启动的缓存
+
+        某个上下文创建失败时不影响其他上下文，K8S_INFORMER_RETRY_INTERVAL 秒后的调用再重试。
+        wait 为 True 时最多等到各缓存创建后 K8S_SYNC_TIMEOUT 秒的截止时间，所有调用共用该截止时间；
+        超过截止时间仍未同步的缓存（如集群不可用）不再等待，直接使用已缓存的 Pod。
+        """
+        with self._pod_informers_lock:
+            now = time.monotonic()
+            if now >= self._pod_informers_retry_at:
+                self._pod_informers_retry_at = float('inf')
+                try:
+                    contexts = self._k8s_contexts()
+                except Exception as e:
+                    logger.error(f"读取 K8s 上下文失败，{self.K8S_INFORMER_RETRY_INTERVAL}s 后重试: {str(e)}")
+                    contexts = []
+                    self._pod_informers_retry_at = now + self.K8S_INFORMER_RETRY_INTERVAL
+                for ctx_name in contexts:
+                    if ctx_name in self._pod_informers:
+                        continue
+                    try:
+                        informer = PodInformer(ctx_name, self.get_k8s_api(ctx_name), self.k8s_page_limit)
+                    except Exception as e:
+                        logger.error(f"创建 K8s 上下文 {ctx_name} 的 Pod 缓存失败，"
+                                     f"{self.K8S_INFORMER_RETRY_INTERVAL}s 后重试: {str(e)}")
+                        self._pod_informers_retry_at = now + self.K8S_INFORMER_RETRY_INTERVAL
+                        continue
+                    informer.start()
+                    self._pod_informers[ctx_name] = informer
+                    self._pod_informer_deadlines[ctx_name] = now + self.k8s_sync_timeout
+            informers = list(self._pod_informers.values())
+
+        for informer in (informers if wait else ()):
+            remaining = self._pod_informer_deadlines[informer.ctx_name] - time.monotonic()
+            if remaining > 0 and not informer.wait_synced(remaining):
+                logger.warning(f"K8s 上下文 {informer.ctx_name} Pod 缓存尚未完成同步，使用已缓存的 Pod")
+        return informers
+
+    def list_k8s_resources(self) -> List[Tuple[str, Dict]]:
+        """并发遍历所有 K8s 上下文拉取 Pod 清单
+
+        非 watch 模式下首次全量 list，之后只拉取上次 resourceVersion 以来的变更事件；
+        某个上下文拉取失败时沿用其上次的清单。
+        """
+        if self.k8s_watch:
+            return [pair for informer in self.get_pod_informers() for pair in informer.items()]
+
+        def poll_pods(ctx_name: str) -> List[Tuple[str, Dict]]:
+            with self._pod_informers_lock:
+                poller = self._pod_pollers.get(ctx_name)
+                if poller is None:
+                    poller = PodInformer(ctx_name, self.get_k8s_api(ctx_name), self.k8s_page_limit)
+                    self._pod_pollers[ctx_name] = poller
+            try:
+                events = poller.poll(self.K8S_POLL_TIMEOUT)
+                if events >= 0:
+                    logger.info(f"K8s 上下文 {ctx_name} 增量同步 {events} 个 Pod 事件")
+            except Exception as e:
+                record_metrics(errors=1)
+                logger.error(f"增量同步 K8s 上下文 {ctx_name} 时发生错误，沿用上次的 Pod 清单: {str(e)}")
+            return poller.items()
+
+        return self._map_k8s_contexts(poll_pods)
+
+    # ---------------------- 内存索引 ----------------------
+    def _inventory_loaders(self) -> Dict[Tuple[str, Optional[str]], Callable[[], List[Tuple[str, Dict]]]]:
+        """索引数据源：每个 (资源类型, 地域) 一个加载函数，K8s 的地域为 None"""
+        if self._index_regions is None:
+            self._index_regions = self.resolve_regions()
+        loaders = {}
+        for name, provider in self.providers.items():
+            if provider.regional:
+                for region in self._index_regions:
+                    loaders[(name, region)] = self.metrics.bind(name, partial(self._list_source, provider, region))
+            elif not (name == "k8s" and self.k8s_watch):
+                # watch 模式下 K8s 直接读取 Pod 缓存，不进入按 TTL 刷新的索引
+                loaders[(name, None)] = self.metrics.bind(name, partial(self._list_source, provider, None))
+        return loaders
+
+    @staticmethod
+    def _list_source(provider: ResourceProvider, region: Optional[str]) -> List[Tuple[str, Dict]]:
+        if region is None:
+            return list(provider.list_resources())
+
+        # 同一资源的多个 IP 共用一份带地域标注的资源信息；清单是流式产出的，
+        # 需保留原对象的引用，避免其被回收后 id 被后续记录复用
+        tagged: Dict[int, Tuple[Dict, Dict]] = {}
+        pairs = []
+        for ip, record in provider.list_resources(region):
+            if id(record) not in tagged:
+                tagged[id(record)] = (record, dict(record, cloud_region=region))
+            pairs.append((ip, tagged[id(record)][1]))
+        return pairs
+
+    @staticmethod
+    def _source_label(source: Tuple[str, Optional[str]]) -> str:
+        name, region = source
+        return f"{name}@{region}" if region else name
+
+    @staticmethod
+    def _fingerprint(record: Dict) -> str:
+        """资源信息指纹：规范化 JSON 的 128 位摘要，随快照保存"""
+        data = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str).encode()
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def _apply_source(self, source: Tuple[str, Optional[str]], pairs: List[Tuple[str, Dict]],
+                      fetched_at: Optional[float] = None) -> Dict[str, int]:
+        """标准化新拉取的清单并按增量更新索引，返回 added/removed/changed/unchanged 计数"""
+        return self._apply_entries(source, self._source_entries(source, pairs), fetched_at)
+
+    def _source_entries(self, source: Tuple[str, Optional[str]],
+                        pairs: List[Tuple[str, Dict]]) -> Dict[Tuple[str, str], Dict]:
+        """把 (IP, 资源信息) 标准化为索引条目 {(标准化 IP, 资源信息指纹): 资源信息}
+
+        只在取上次的 IP -> 条目 映射时持有索引锁（该映射只整体替换、不原地修改），标准化和计算指纹不阻塞查询。
+        """
+        with self._index_lock:
+            old_by_ip: Dict[str, List[Tuple[str, Dict]]] = (self._sources.get(source) or {}).get("by_ip", {})
+
+        # 每次拉取的资源信息都是新对象（地域标注、PodRecord.to_dict() 等），按 (数据源, IP) 找到上次的资源信息，
+        # 内容相等时沿用其指纹，只为新增或变化的资源计算指纹；同一对象对应多个 IP 时只计算一次
+        fingerprints: Dict[int, str] = {}
+        entries: Dict[Tuple[str, str], Dict] = {}
+        for ip, record in pairs:
+            # 上次已出现的地址本身就是标准形式，无需重新解析
+            key = ip if ip in old_by_ip else normalize_ip(ip)
+            if key is None:
+                continue
+            fingerprint = fingerprints.get(id(record))
+            if fingerprint is None:
+                for old_fingerprint, old_record in old_by_ip.get(key, ()):
+                    if old_record == record:
+                        fingerprint = old_fingerprint
+                        break
+                else:
+                    fingerprint = self._fingerprint(record)
+                fingerprints[id(record)] = fingerprint
+            entries[(key, fingerprint)] = record
+        return entries
+
+    @staticmethod
+    def _diff_entries(old_entries: Dict[Tuple[str, str], Dict], entries: Dict[Tuple[str, str], Dict]):
+        """比较新旧条目，返回 (沿用旧对象后的新条目, 删除的键, 新增的键)"""
+        if not old_entries:
+            # 首次加载（如从快照启动）时全部为新增条目
+            return entries, set(), entries.keys()
+        entries = {key: old_entries.get(key, record) for key, record in entries.items()}
+        return entries, old_entries.keys() - entries.keys(), entries.keys() - old_entries.keys()
+
+    def _apply_entries(self, source: Tuple[str, Optional[str]], entries: Dict[Tuple[str, str], Dict],
+                       fetched_at: Optional[float] = None) -> Dict[str, int]:
+        """将数据源的新条目与上次的条目比较，只对索引执行新增和删除
+
+        条目以 (IP, 资源信息指纹) 标识，同一 IP 上资源信息变化时替换旧条目（计为 changed）；
+        未变化的条目保留索引中原有的对象。返回 added/removed/changed/unchanged 计数。
+        比较在锁外进行，索引锁只在增删索引条目、替换数据源记录时持有。
+        """
+        with self._index_lock:
+            old = self._sources.get(source)
+        old_entries: Dict[Tuple[str, str], Dict] = (old or {}).get("entries", {})
         while True:
-            ip_to_query = input("\n请输入要查询的 IP 地址（或输入 q 退出）: ").strip()
-            if ip_to_query.lower() == 'q':
+            entries, removed, added = self._diff_entries(old_entries, entries)
+            by_ip: Dict[str, List[Tuple[str, Dict]]] = {}
+            for (ip, fingerprint), record in entries.items():
+                by_ip.setdefault(ip, []).append((fingerprint, record))
+            # 有变化的 IP 上本数据源的新资源信息列表，None 表示该 IP 上已没有本数据源的资源
+            if old_entries:
+                updates = {ip: [record for _, record in by_ip[ip]] if ip in by_ip else None
+                           for ip in {key[0] for key in added} | {key[0] for key in removed}}
+            else:
+                updates = {ip: [record for _, record in items] for ip, items in by_ip.items()}
+            with self._index_lock:
+                if self._sources.get(source) is not old:
+                    # 同一数据源在比较期间被其他线程更新（刷新已由 _refresh_lock 串行化，通常不会发生），重新比较
+                    old = self._sources.get(source)
+                    old_entries = (old or {}).get("entries", {})
+                    continue
+                # 索引中每个 IP 的 {数据源: [资源信息]} 只整体替换、不原地修改，网段索引重建时浅复制即可在锁外遍历
+                for ip, records in updates.items():
+                    bucket = self._index.get(ip)
+                    if bucket is None:
+                        if records:
+                            self._index[ip] = {source: records}
+                        continue
+                    bucket = dict(bucket)
+                    if records:
+                        bucket[source] = records
+                    else:
+                        bucket.pop(source, None)
+                    if bucket:
+                        self._index[ip] = bucket
+                    else:
+                        del self._index[ip]
+
+                self._sources[source] = {
+                    "fetched_at": fetched_at or time.time(),
+                    "entries": entries,
+                    "by_ip": by_ip,
+                    "ips": len(by_ip)
+                }
+                if added or removed:
+                    self._index_version += 1
                 break
 
-            if not all(part.isdigit() for part in ip_to_query.split('.')):
-                print("错误：请输入有效的 IPv4 地址")
+        changed_ips = {key[0] for key in added} & {key[0] for key in removed} if removed else set()
+        changed = sum(1 for key in added if key[0] in changed_ips) if changed_ips else 0
+        return {
+            "added": len(added) - changed,
+            "removed": sum(1 for key in removed if key[0] not in changed_ips),
+            "changed": changed,
+            "unchanged": len(entries) - len(added)
+        }
+
+    def enable_snapshot(self, path: str):
+        """从快照加载索引并开启后台刷新
+
+        快照中没有的数据源（首次运行或新增的资源类型、地域）先同步拉取，避免查询在数据就绪前返回空结果；
+        快照中已有但过期的数据源在后台重新拉取。
+        """
+        start = time.time()
+        self._snapshot = InventorySnapshot(path)
+        loaders = self._inventory_loaders()
+        loaded = 0
+        # 加载时一次性创建大量对象，暂停循环垃圾回收，避免其反复扫描整个堆
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for source, fetched_at, entries in self._snapshot.load():
+                if source in loaders:
+                    self._apply_entries(source, entries, fetched_at)
+                    loaded += 1
+        finally:
+            if gc_enabled:
+                gc.enable()
+        logger.info(f"已从快照 {path} 加载 {loaded} 个数据源，共 {len(self._index)} 个 IP，耗时 {time.time() - start:.2f}s")
+        missing = {source: loader for source, loader in loaders.items() if source not in self._sources}
+        if missing:
+            logger.info(f"快照中缺少 {len(missing)} 个数据源，先同步拉取")
+            with self._refresh_lock:
+                self._refresh_sources(missing)
+        self.background_refresh = True
+        self.refresh_index_async()
+
+    def _stale_sources(self, force: bool = False) -> Dict[Tuple[str, Optional[str]], Callable]:
+        now = time.time()
+        stale = {}
+        for source, loader in self._inventory_loaders().items():
+            entry = self._sources.get(source)
+            if force or not entry or now - entry["fetched_at"] >= self.index_ttl:
+                stale[source] = loader
+        return stale
+
+    def refresh_index(self, force: bool = False):
+        """拉取过期（或全部）数据源并更新内存索引，同一时间只有一个刷新在进行"""
+        with self._refresh_lock:
+            self._refresh_sources(self._stale_sources(force))
+
+    def refresh_index_async(self):
+        """在后台线程刷新过期数据源，已有刷新在进行或没有过期数据源时直接返回"""
+        if not self._stale_sources() or not self._refresh_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self._refresh_sources(self._stale_sources())
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name="index-refresh", daemon=True).start()
+
+    def wait_for_refresh(self):
+        """等待正在进行的后台刷新结束"""
+        with self._refresh_lock:
+            pass
+
+    def _ensure_fresh(self):
+        if self.background_refresh:
+            self.refresh_index_async()
+        else:
+            self.refresh_index()
+
+    def index_status(self) -> Dict:
+        """索引状态：数据源总数、已成功加载的数据源数、IP 数及最早的拉取时间
+
+        首次拉取失败的数据源只记录了拉取时间（用于重试间隔），没有清单，不计为已加载。
+        地域列表尚未确定时（如 all 模式下地域发现还未成功）报告 regions_resolved 为 False，
+        不在调用方线程里触发地域发现，由刷新流程负责确定地域。
+        """
+        regions_resolved = self._index_regions is not None
+        sources = self._inventory_loaders() if regions_resolved else {}
+        with self._index_lock:
+            fetched = [self._sources[source]["fetched_at"] for source in sources
+                       if "entries" in self._sources.get(source, {})]
+            ips = len(self._index)
+        return {
+            "ready": regions_resolved and len(fetched) == len(sources),
+            "regions_resolved": regions_resolved,
+            "sources": len(sources),
+            "loaded_sources": len(fetched),
+            "ips": ips,
+            "oldest_fetched_at": min(fetched) if fetched else None,
+            "refreshing": self._refresh_lock.locked(),
+            "api_rates": self.api_rates()
+        }
+
+    def prometheus_metrics(self) -> str:
+        """Prometheus 文本格式的指标：各资源类型的累计指标、接口限速速率及索引规模"""
+        lines = self.metrics.prometheus()
+        lines.append("# TYPE ip_locator_api_rate gauge")
+        for action, rate in self.api_rates().items():
+            lines.append(f'ip_locator_api_rate{{action="{action}"}} {rate:g}')
+        with self._index_lock:
+            ips = len(self._index)
+        lines.append("# TYPE ip_locator_index_ips gauge")
+        lines.append(f"ip_locator_index_ips {ips}")
+        return "\n".join(lines) + "\n"
+
+    def _refresh_sources(self, stale: Dict[Tuple[str, Optional[str]], Callable]):
+        """并发拉取给定数据源并更新内存索引（及快照），拉取失败的数据源保留旧数据"""
+        if not stale:
+            return
+        start = time.time()
+        touched = total = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale)), thread_name_prefix="inventory") as executor:
+            futures = {executor.submit(loader): source for source, loader in stale.items()}
+            for future in as_completed(futures):
+                source = futures[future]
+                label = self._source_label(source)
+                try:
+                    pairs = future.result()
+                except Exception as e:
+                    # 保留旧数据，等下一个 TTL 周期再重试
+                    logger.error(f"拉取 {label} 资源清单时发生错误: {str(e)}")
+                    with self._index_lock:
+                        self._sources.setdefault(source, {"ips": 0})["fetched_at"] = start
+                    continue
+                previous = len(self._sources.get(source, {}).get("entries", ()))
+                delta = self._apply_source(source, pairs)
+                fetched_at = self._sources[source]["fetched_at"]
+                changes = delta["added"] + delta["removed"] + delta["changed"]
+                if self._snapshot and (changes or not self._snapshot.touch(source, fetched_at)):
+                    self._snapshot.save(source, fetched_at, self._sources[source]["entries"])
+                touched += changes
+                total += previous + len(self._sources[source]["entries"])
+                logger.info(f"{label} 资源清单已刷新，共 {self._sources[source]['ips']} 个 IP，"
+                            f"新增 {delta['added']} / 删除 {delta['removed']} / 变更 {delta['changed']} / "
+                            f"未变 {delta['unchanged']} 条")
+        logger.info(f"资源索引就绪，共 {len(self._index)} 个 IP，增量更新 {touched} 条（全量重建需 {total} 条），"
+                    f"耗时 {time.time() - start:.2f}s")
+
+    def locate(self, ip: str, refresh: bool = True) -> Dict:
+        """从内存索引查询 IP 绑定的资源，索引超过 TTL 时先刷新（快照模式下在后台刷新）"""
+        if refresh:
+            self._ensure_fresh()
+        key = normalize_ip(ip)
+        result = {"ip": ip}
+        for name in self.providers:
+            result[name] = []
+        with self._index_lock:
+            for (name, _), records in (self._index.get(key, {}) if key else {}).items():
+                result[name].extend(records)
+        if self.k8s_watch and key:
+            # watch 模式下 Pod 缓存实时更新，直接读取而不使用按 TTL 刷新的索引快照
+            informers = self.get_pod_informers(wait=not self.background_refresh)
+            result["k8s"] = [record for informer in informers for record in informer.lookup(key)]
+        return result
+
+    def _get_sorted_index(self) -> SortedIPIndex:
+        """按需重建有序数组索引：哈希索引变化后重建；watch 模式下 Pod 变化时最多每 CIDR_REBUILD_INTERVAL 秒重建一次
+
+        持有 _index_lock 时只浅复制哈希索引，展开条目、解析地址和排序在锁外进行，重建期间不阻塞单 IP 查询；
+        同一时间只有一个线程重建，其余网段查询等待其完成后直接使用。
+        """
+        informers = self.get_pod_informers(wait=not self.background_refresh) if self.k8s_watch else []
+        informer_versions = tuple(informer.version for informer in informers)
+        with self._sorted_index_lock:
+            with self._index_lock:
+                index = self._sorted_index
+                if index is not None and self._sorted_index_key[0] == self._index_version and (
+                        self._sorted_index_key[1] == informer_versions
+                        or time.time() - index.built_at < self.CIDR_REBUILD_INTERVAL):
+                    return index
+
+                index_version = self._index_version
+                buckets = list(self._index.items())
+            entries = [(ip, source[0], record)
+                       for ip, bucket in buckets
+                       for source, records in bucket.items()
+                       for record in records]
+            entries.extend((ip, "k8s", record) for informer in informers for ip, record in informer.items())
+            index = SortedIPIndex(entries)
+            with self._index_lock:
+                self._sorted_index = index
+                self._sorted_index_key = (index_version, informer_versions)
+            return index
+
+    def locate_cidr(self, cidr: str, refresh: bool = True) -> Dict:
+        """查询网段（如 10.20.0.0/16）内所有 IP 绑定的资源，每条记录以 matched_ip 标注命中的 IP"""
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+        if refresh:
+            self._ensure_fresh()
+        result = {"cidr": network.compressed}
+        for name in self.providers:
+            result[name] = []
+        for ip, name, record in self._get_sorted_index().query(network):
+            result[name].append(dict(record, matched_ip=ip))
+        return result
+
+    def locate_many(self, ips: Iterable[str]) -> Iterator[Dict]:
+        """批量查询：只拉取一次全量清单，逐个产出查询结果，输入可以是任意长度的流"""
+        self._ensure_fresh()
+        for ip in ips:
+            if normalize_ip(ip) is None:
+                yield {"ip": ip, "error": "invalid ip"}
                 continue
+            yield self.locate(ip, refresh=False)
 
-            result = locator.query_all_resources(ip_to_query)
 
-            print("\n查询结果:")
-            for resource_type in ["k8s", "clb", "cvm", "cfs", "mariadb", "redis", "ckafka", "elasticsearch"]:
-                if result[resource_type]:
-                    for item in result[resource_type]:
-                        print(f"- 资源类型：{item['type']}")
+def read_ips(stream: TextIO) -> Iterator[str]:
+    """逐行读取 IP，忽略空行和 # 注释，每行取第一个字段（兼容 CSV / 日志格式）"""
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield line.replace(',', ' ').split()[0]
 
-                        # 腾讯云资源
-                        if 'instance_id' in item:
-                            print(f"  实例ID: {item.get('instance_id')}")
-                            print(f"  实例名称: {item.get('instance_name', 'N/A')}")
 
-                        if 'region' in item:
-                            print(f"  区域: {item.get('region')}")
+def print_result(result: Dict):
+    print("\n查询结果:")
+    for resource_type, items in result.items():
+        if resource_type in ("ip", "cidr", "regions", "status"):
+            continue
+        if items:
+            for item in items:
+                print(f"- 资源类型：{item['type']}")
+
+                # 腾讯云资源
+                if 'instance_id' in item:
+                    print(f"  实例ID: {item.get('instance_id')}")
+                    print(f"  实例名称: {item.get('instance_name', 'N/A')}")
+
+                if 'matched_ip' in item:
+                    print(f"  命中IP: {item.get('matched_ip')}")
+
+                if 'cloud_region' in item:
+                    print(f"  地域: {item.get('cloud_region')}")
+
+                if 'region' in item:
+                    print(f"  区域: {item.get('region')}")
+
+                if 'private_ip' in item:
+                    print(f"  内网IP: {item.get('private_ip', 'N/A')}")
+
+                if 'public_ip' in item:
+                    print(f"  外网IP: {item.get('public_ip', 'N/A')}")
+
+                if 'bound_instance' in item:
+                    print(f"  绑定实例: {item.get('bound_instance') or 'N/A'}")
+
+                if 'vip' in item:
+                    print(f"  VIP: {item.get('vip')}")
+
+                if 'port' in item:
+                    print(f"  端口: {item.get('port')}")
+
+                if 'client_ip' in item:
+                    print(f"  客户端IP: {item.get('client_ip')}")
+
+                # K8s 资源
+                if 'cluster_id' in item:
+                    print(f"  集群ID: {item.get('cluster_id')}")
+
+                if 'namespace' in item:
+                    print(f"  命名空间: {item.get('namespace')}")
+
+                if 'container_name' in item:
+                    print(f"  容器名称: {item.get('container_name')}")
+
+                if 'pod_ip' in item:
+                    print(f"  Pod IP: {item.get('pod_ip')}")
+
+    incomplete = [f"{name}({state})" for name, state in result.get("status", {}).items() if state != "ok"]
+    if incomplete:
+        print(f"- 未完成的查询：{', '.join(incomplete)}")
+
+
+def print_metrics(stats: Dict[str, Dict[str, float]], file: TextIO = sys.stdout):
+    """按资源类型输出本次查询的耗时及 API 调用统计"""
+    if not stats:
+        return
+    columns = ProviderMetrics.FIELDS[1:]
+    print("\n各资源类型统计:", file=file)
+    print(f"{'provider':<16}" + "".join(f"{column:>14}" for column in columns), file=file)
+    for name, values in sorted(stats.items(), key=lambda item: -item[1]["seconds"]):
+        cells = [f"{values['seconds']:.3f}"] + [f"{values[column]:g}" for column in columns[1:]]
+        print(f"{name:<16}" + "".join(f"{cell:>14}" for cell in cells), file=file)
+
+
+def run_batch(locator: TencentCloudIPLocator, path: str, live: bool = False):
+    """批量模式：逐行读取 IP，每个结果输出一行 JSON（NDJSON），日志只写 stderr
+
+    live 为 True 时不构建全量索引，读完所有 IP 后由 query_many 规划批量实时查询。
+    """
+    before = locator.metrics.snapshot()
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    with stream:
+        results = locator.query_many(read_ips(stream)) if live else locator.locate_many(read_ips(stream))
+        for result in results:
+            print(json.dumps(result, ensure_ascii=False, default=str), flush=True)
+    # 等待后台刷新写回快照，下次启动即可使用最新数据
+    locator.wait_for_refresh()
+    print_metrics(locator.metrics.since(before), file=sys.stderr)
+    logger.info(f"SDK 连接统计: {locator.client_stats()}，接口速率: {locator.api_rates()}")
+
+
+class LocatorRequestHandler(BaseHTTPRequestHandler):
+    """HTTP 查询接口：只读取内存索引，云 API 调用全部在后台刷新线程中进行
+
+    GET /ip/{addr}、GET /cidr/{net}（如 /cidr/10.20.0.0/16）、POST /batch（IP 列表或 {"ips": [...]}）、
+    GET /healthz、GET /metrics（Prometheus 文本格式）
+    """
+    locator: TencentCloudIPLocator = None
+    MAX_BATCH = 10000
+
+    def do_GET(self):
+        path = unquote(urlparse(self.path).path)
+        if path == '/healthz':
+            self._send(200, self.locator.index_status())
+        elif path.startswith('/ip/'):
+            ip = path[len('/ip/'):]
+            if normalize_ip(ip) is None:
+                self._send(400, {"error": "invalid ip"})
+                return
+            self._send(200, self.locator.locate(ip, refresh=False))
+        elif path == '/metrics':
+            body = self.locator.prometheus_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path.startswith('/cidr/'):
+            try:
+                result = self.locator.locate_cidr(path[len('/cidr/'):], refresh=False)
+            except ValueError:
+                self._send(400, {"error": "invalid cidr"})
+                return
+            self._send(200, result)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if unquote(urlparse(self.path).path) != '/batch':
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'null')
+        except ValueError:
+            self._send(400, {"error": "invalid json"})
+            return
+        ips = body.get("ips") if isinstance(body, dict) else body
+        if not isinstance(ips, list) or not all(isinstance(ip, str) for ip in ips):
+            self._send(400, {"error": "expected a list of ips"})
+            return
+        if len(ips) > self.MAX_BATCH:
+            self._send(413, {"error": f"at most {self.MAX_BATCH} ips per request"})
+            return
+        self._send(200, [self.locator.locate(ip, refresh=False) if normalize_ip(ip) else {"ip": ip, "error": "invalid ip"}
+                         for ip in ips])
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def run_server(locator: TencentCloudIPLocator, address: str):
+    """服务模式：常驻内存索引并提供 HTTP 查询接口，后台线程定期刷新过期数据源
+
+    接口没有鉴权，未指定主机时只监听本机回环地址；需要对外提供服务时显式指定，如 0.0.0.0:8080。
+    """
+    host, _, port = address.rpartition(':')
+    host = host or '127.0.0.1'
+    locator.background_refresh = True
+    interval = max(1.0, min(30.0, locator.index_ttl / 10))
+
+    def refresh_loop():
+        # 每轮单独捕获异常（如 all 模式下地域发现失败），只跳过本轮，下一轮重试
+        while True:
+            try:
+                if locator.k8s_watch:
+                    locator.get_pod_informers(wait=False)
+                locator.refresh_index_async()
+            except Exception as e:
+                logger.error(f"后台刷新索引失败，{interval:g}s 后重试: {str(e)}")
+            time.sleep(interval)
+
+    threading.Thread(target=refresh_loop, name="index-refresher", daemon=True).start()
+
+    handler = type('Handler', (LocatorRequestHandler,), {"locator": locator})
+    server = ThreadingHTTPServer((host, int(port)), handler)
+    server.daemon_threads = True
+    logger.info(f"IP 定位服务已启动，监听 {host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
 
-                        if 'private_ip' in item:
-                            print(f"  内网IP: {item.get('private_ip', 'N/A')}")
 
-                        if 'public_ip' in item:
-                            print(f"  外网IP: {item.get('public_ip', 'N/A')}")
+def run_interactive(locator: TencentCloudIPLocator, args: argparse.Namespace):
+    if args.index and not args.snapshot:
+        locator.refresh_index(force=True)
 
-                        if 'vip' in item:
-                            print(f"  VIP: {item.get('vip')}")
+    while True:
+        ip_to_query = input("\n请输入要查询的 IP 地址或网段（或输入 q 退出）: ").strip()
+        if ip_to_query.lower() == 'q':
+            break
 
-                        if 'port' in item:
-                            print(f"  端口: {item.get('port')}")
+        before = locator.metrics.snapshot()
+        if '/' in ip_to_query:
+            try:
+                print_result(locator.locate_cidr(ip_to_query))
+                print_metrics(locator.metrics.since(before))
+            except ValueError:
+                print("错误：请输入有效的网段，如 10.20.0.0/16")
+            continue
 
-                        if 'client_ip' in item:
-                            print(f"  客户端IP: {item.get('client_ip')}")
+        if normalize_ip(ip_to_query) is None:
+            print("错误：请输入有效的 IPv4 / IPv6 地址")
+            continue
 
-                        # K8s 资源
-                        if 'cluster_id' in item:
-                            print(f"  集群ID: {item.get('cluster_id')}")
+        if args.index or args.snapshot:
+            print_result(locator.locate(ip_to_query))
+            print_metrics(locator.metrics.since(before))
+            continue
 
-                        if 'namespace' in item:
-                            print(f"  命名空间: {item.get('namespace')}")
+        if locator.regions_setting:
+            print_result(locator.query_all_regions(ip_to_query))
+        elif args.concurrent:
+            print_result(locator.query_all_resources_concurrent(ip_to_query))
+        else:
+            print_result(locator.query_all_resources(ip_to_query))
+        print_metrics(locator.metrics.since(before))
+        break
 
-                        if 'container_name' in item:
-                            print(f"  容器名称: {item.get('container_name')}")
+    logger.info(f"SDK 连接统计: {locator.client_stats()}，接口速率: {locator.api_rates()}")
 
-                        if 'pod_ip' in item:
-                            print(f"  Pod IP: {item.get('pod_ip')}")
 
-            break
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="腾讯云 IP 资源定位")
+    parser.add_argument("--index", action="store_true",
+                        help="预先拉取全量资源清单构建内存索引，后续查询直接命中内存（IP_INDEX_TTL 控制刷新间隔）")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="并发查询各资源类型，单个资源类型超过 PROVIDER_TIMEOUT 秒未返回则跳过")
+    parser.add_argument("--regions", metavar="REGIONS",
+                        help="逗号分隔的地域列表，或 all 查询所有可用地域（默认读取 TENCENTCLOUD_REGIONS）")
+    parser.add_argument("--snapshot", metavar="PATH", nargs="?", const="target/ip-index.sqlite",
+                        help="从磁盘快照加载资源索引立即响应查询，过期数据源在后台刷新并写回快照")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="批量查询文件中的 IP（每行一个，- 表示标准输入），结果按行输出 JSON")
+    parser.add_argument("--live", action="store_true",
+                        help="批量模式下不构建全量索引，按资源类型合并过滤请求实时查询（适合少量 IP）")
+    parser.add_argument("--serve", metavar="HOST:PORT",
+                        help="以服务模式运行，提供 /ip/{addr}、/cidr/{net}、POST /batch、/healthz 和 /metrics 接口"
+                             "（未指定 HOST 时只监听 127.0.0.1）")
+    args = parser.parse_args()
+
+    try:
+        locator = TencentCloudIPLocator()
+        if args.regions:
+            locator.regions_setting = args.regions
+        if args.snapshot:
+            locator.enable_snapshot(args.snapshot)
+        if args.serve:
+            run_server(locator, args.serve)
+        elif args.batch:
+            run_batch(locator, args.batch, live=args.live)
+        else:
+            run_interactive(locator, args)
 
     except KeyboardInterrupt:
         print("\n程序已退出")
     except Exception as e:
-        logger.error(f"程序运行异常: {str(e)}")
\ No newline at end of file
+        logger.error(f"程序运行异常: {str(e)}")